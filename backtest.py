@@ -0,0 +1,134 @@
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from trading import Position, SettingsSnapshot, Strategy
+
+TIME_COLUMNS = ("Datetime", "Date", "timestamp")
+
+
+def profit_factor(gross_profit: float, gross_loss: float) -> float:
+    if gross_loss == 0:
+        return float("inf") if gross_profit > 0 else 0.0
+    return gross_profit / gross_loss
+
+
+@dataclass
+class BacktestResult:
+    ledger: list[Position]
+    ticks: int
+    final_budget: float
+
+    @property
+    def profit(self) -> float:
+        return sum(position.profit for position in self.ledger)
+
+    @property
+    def gross_profit(self) -> float:
+        return sum(p.profit for p in self.ledger if p.profit > 0)
+
+    @property
+    def gross_loss(self) -> float:
+        return -sum(p.profit for p in self.ledger if p.profit < 0)
+
+    @property
+    def profit_factor(self) -> float:
+        return profit_factor(self.gross_profit, self.gross_loss)
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "ticks": self.ticks,
+            "trades": len(self.ledger),
+            "wins": sum(1 for position in self.ledger if position.profit > 0),
+            "losses": sum(1 for position in self.ledger if position.profit < 0),
+            "profit": self.profit,
+            "profit_factor": self.profit_factor,
+            "final_budget": self.final_budget,
+        }
+
+
+def load_prices(path: str, column: str = "Close") -> tuple[np.ndarray, np.ndarray]:
+    """Read a price series from CSV or Parquet, e.g. a saved yfinance history.
+
+    Returns (timestamps as datetime64[ns], prices as float64).
+    """
+    if path.endswith(".parquet"):
+        frame = pd.read_parquet(path)
+    else:
+        frame = pd.read_csv(path)
+
+    for time_column in TIME_COLUMNS:
+        if time_column in frame.columns:
+            times = frame[time_column]
+            break
+    else:
+        times = frame.index
+
+    timestamps = pd.DatetimeIndex(pd.to_datetime(times, utc=True)).tz_localize(None)
+    return timestamps.to_numpy(), frame[column].to_numpy(dtype=np.float64)
+
+
+def run(
+    prices: np.ndarray,
+    settings: SettingsSnapshot,
+    timestamps: np.ndarray | None = None,
+    budget: float = 1000,
+    sliding: bool = False,
+) -> BacktestResult:
+    """Replay prices through the same rules as `TradeNode.trade`.
+
+    Nothing is printed, committed or published while replaying, and trades are
+    stamped with the replayed time instead of the wall clock.
+    """
+    tick = 0
+
+    def clock() -> datetime:
+        if timestamps is None:
+            return datetime.fromtimestamp(tick)
+        return pd.Timestamp(timestamps[tick]).to_pydatetime()
+
+    strategy = Strategy(settings, budget=budget, clock=clock, sliding=sliding)
+    ledger: list[Position] = []
+
+    price = None
+    for tick, price in enumerate(np.asarray(prices, dtype=np.float64).tolist()):
+        decision = strategy.on_price(price)
+        if decision is not None and decision.opened is not None:
+            ledger.append(decision.opened)
+    strategy.end_trading(price)
+
+    return BacktestResult(
+        ledger=ledger,
+        ticks=len(prices),
+        final_budget=strategy.brokerage.budget,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay prices through Jellyfish.")
+    parser.add_argument("path", help="CSV or Parquet file with a price column")
+    parser.add_argument("--column", default="Close")
+    parser.add_argument("--allocation-of-funds", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=2)
+    parser.add_argument("--prices-in-groups", type=int, default=5)
+    parser.add_argument("--compliance", type=int, default=3)
+    parser.add_argument("--sliding", action="store_true")
+    args = parser.parse_args()
+
+    timestamps, prices = load_prices(args.path, args.column)
+    result = run(
+        prices,
+        SettingsSnapshot(
+            allocation_of_funds=args.allocation_of_funds,
+            groups=args.groups,
+            prices_in_groups=args.prices_in_groups,
+            compliance=args.compliance,
+        ),
+        timestamps=timestamps,
+        sliding=args.sliding,
+    )
+    for key, value in result.summary().items():
+        print(f"{key}: {value}")
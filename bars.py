@@ -0,0 +1,74 @@
+from collections import deque
+from dataclasses import dataclass
+
+# Bar lengths in seconds
+RESOLUTIONS = {"1s": 1, "1m": 60, "5m": 300}
+
+
+@dataclass
+class Bar:
+    start: float
+    open: float
+    high: float
+    low: float
+    close: float
+    # The price feed has no traded volume, so this counts ticks
+    volume: int = 1
+
+
+class BarBuilder:
+    """Keeps OHLCV bars of every resolution up to date as ticks arrive.
+
+    Each tick updates the open bar of every resolution in constant time. A bar
+    closes when the first tick of a later period arrives; `update` returns the
+    bars that closed, and the last `history` closed bars are kept per ticker
+    and resolution. Periods without ticks produce no bars.
+    """
+
+    def __init__(
+        self, resolutions: dict[str, int] = RESOLUTIONS, history: int = 1000
+    ) -> None:
+        self.resolutions = resolutions
+        self.history = history
+        self._open: dict[tuple[str, str], Bar] = {}
+        self._closed: dict[tuple[str, str], deque[Bar]] = {}
+
+    def update(
+        self, ticker: str, timestamp: float, price: float
+    ) -> list[tuple[str, Bar]]:
+        closed = []
+        for resolution, seconds in self.resolutions.items():
+            key = (ticker, resolution)
+            start = timestamp - timestamp % seconds
+            bar = self._open.get(key)
+
+            # Late ticks are folded into the open bar
+            if bar is not None and start <= bar.start:
+                if price > bar.high:
+                    bar.high = price
+                elif price < bar.low:
+                    bar.low = price
+                bar.close = price
+                bar.volume += 1
+                continue
+
+            if bar is not None:
+                history = self._closed.get(key)
+                if history is None:
+                    history = self._closed[key] = deque(maxlen=self.history)
+                history.append(bar)
+                closed.append((resolution, bar))
+            self._open[key] = Bar(start, price, price, price, price)
+        return closed
+
+    def bars(
+        self, ticker: str, resolution: str, count: int | None = None
+    ) -> list[Bar]:
+        """Closed bars, oldest first, the last `count` of them if given."""
+        history = list(self._closed.get((ticker, resolution), ()))
+        if count is None:
+            return history
+        return history[-count:] if count > 0 else []
+
+    def current(self, ticker: str, resolution: str) -> Bar | None:
+        return self._open.get((ticker, resolution))
@@ -0,0 +1,37 @@
+"""The NumPy analysis kernel against the marker-list implementation it replaced.
+
+Run from the repository root: python -m benchmarks.analysis
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from benchmarks.reference import marker_analyze
+from trading import analyze
+
+
+def best(function, number: int) -> float:
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--prices-in-groups", type=int, default=5)
+    parser.add_argument("--compliance", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'groups':>7}  {'marker lists':>12}  {'analyze':>10}  {'speedup':>7}")
+    for count in args.groups:
+        groups = rng.random((count, args.prices_in_groups))
+        as_lists = groups.tolist()
+        number = max(1, 10000 // count)
+        before = best(lambda: marker_analyze(as_lists, args.compliance), number)
+        after = best(lambda: analyze(groups, args.compliance), number)
+        print(
+            f"{count:>7}  {before * 1000:>9.3f} ms  {after * 1000:>7.3f} ms  "
+            f"{before / after:>6.1f}x"
+        )
@@ -0,0 +1,55 @@
+"""Size and encode cost of graph updates, binary frames against JSON.
+
+Run from the repository root: python -m benchmarks.graph_frames
+"""
+
+import argparse
+import json
+import random
+import time
+import timeit
+
+import protocol
+
+
+def points(count: int) -> list[protocol.Point]:
+    now = time.time()
+    return [
+        (now + index * 0.25, random.uniform(50, 150), random.choice(protocol.STATES))
+        for index in range(count)
+    ]
+
+
+def encode_json(ticker: str, batch: list[protocol.Point]) -> str:
+    # What SyncConnectionManager.encode puts on the wire for JSON clients
+    return json.dumps(protocol.graph_json(ticker, batch), separators=(",", ":"))
+
+
+def encode_binary(ticker_id: int, batch: list[protocol.Point]) -> bytes:
+    return protocol.encode_graph(ticker_id, batch)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'points':>6}  {'format':<6}  {'bytes/point':>11}  {'µs/point':>8}")
+    for size in args.batch_sizes:
+        batch = points(size)
+        for name, encode, ticker in (
+            ("json", encode_json, "AAPL"),
+            ("binary", encode_binary, 0),
+        ):
+            frame = encode(ticker, batch)
+            frame_size = len(frame.encode() if isinstance(frame, str) else frame)
+            seconds = min(
+                timeit.repeat(
+                    lambda: encode(ticker, batch), number=args.repeat, repeat=3
+                )
+            )
+            print(
+                f"{size:>6}  {name:<6}  {frame_size / size:>11.1f}  "
+                f"{seconds / args.repeat / size * 1e6:>8.2f}"
+            )
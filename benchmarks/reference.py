@@ -0,0 +1,57 @@
+"""Implementations that optimized code replaced, kept to check and time it against.
+
+Used by tests/test_analysis.py and benchmarks/analysis.py.
+"""
+
+from trading import AnalysisResult
+
+
+class BiggerThan: ...
+
+
+class SmallerThan: ...
+
+
+class Equals: ...
+
+
+def marker_analyze(groups: list[list[float]], compliance: int) -> AnalysisResult:
+    """TradeNode._analyze as it was before the NumPy kernel."""
+    comparison_results = []
+    for group in groups:
+        comparison_results.append(
+            [
+                (
+                    BiggerThan
+                    if group[i] > group[i - 1]
+                    else SmallerThan if group[i] < group[i - 1] else Equals
+                )
+                for i in range(1, len(group))
+            ]
+        )
+
+    res = []
+    for group in comparison_results:
+        up_occurrences = len([e for e in group if e == BiggerThan])
+        down_occurrences = len([e for e in group if e == SmallerThan])
+
+        if up_occurrences >= compliance:
+            res.append(BiggerThan)
+        elif down_occurrences >= compliance:
+            res.append(SmallerThan)
+        else:
+            res.append(Equals)
+
+    for group in res:
+        if not group == BiggerThan:
+            break
+    else:
+        return AnalysisResult.GOING_UP
+
+    for group in res:
+        if not group == SmallerThan:
+            break
+    else:
+        return AnalysisResult.GOING_DOWN
+
+    return AnalysisResult.INSUFFICIENT
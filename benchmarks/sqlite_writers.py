@@ -0,0 +1,112 @@
+"""Many processes writing trades to one SQLite file, default journal against WAL.
+
+"default" is SQLite as the ORM used it before, "wal" applies
+jellyserve.orm.SQLITE_PRAGMAS to every connection. Each writer inserts rows and
+commits after every `--batch` of them, like a TradeWriter with that batch size.
+
+Run from the repository root: python -m benchmarks.sqlite_writers
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from multiprocessing import Barrier, Pool
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import OperationalError
+
+from jellyserve.orm import SQLITE_PRAGMAS, _set_sqlite_pragmas
+
+metadata = MetaData()
+trades = Table(
+    "Trades",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("trade_server_id", String),
+    Column("amount", Float),
+    Column("opening_price", Float),
+)
+
+_barrier = None
+
+
+def _init(barrier) -> None:
+    global _barrier
+    _barrier = barrier
+
+
+def engine(path: str, wal: bool):
+    engine = create_engine(f"sqlite:///{path}")
+    if wal:
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def write(path: str, wal: bool, writer: int, rows: int, batch: int) -> dict:
+    latencies = []
+    errors = 0
+    with engine(path, wal).connect() as connection:
+        _barrier.wait()
+        for start in range(0, rows, batch):
+            values = [
+                {"trade_server_id": f"T{writer}", "amount": 1.0, "opening_price": 1.0}
+                for _ in range(min(batch, rows - start))
+            ]
+            started = time.perf_counter()
+            try:
+                connection.execute(insert(trades), values)
+                connection.commit()
+            except OperationalError:
+                connection.rollback()
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    return {"latencies": latencies, "errors": errors}
+
+
+def run(wal: bool, writers: int, rows: int, batch: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.sqlite")
+        setup = engine(path, wal)
+        metadata.create_all(setup)
+        setup.dispose()
+
+        barrier = Barrier(writers)
+        with Pool(writers, initializer=_init, initargs=(barrier,)) as pool:
+            started = time.perf_counter()
+            results = pool.starmap(
+                write, [(path, wal, writer, rows, batch) for writer in range(writers)]
+            )
+            elapsed = time.perf_counter() - started
+
+    latencies = sorted(
+        latency for result in results for latency in result["latencies"]
+    )
+    return {
+        "rows/s": writers * rows / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p99 ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": sum(result["errors"] for result in results),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rows", type=int, default=500, help="rows per writer")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 100])
+    args = parser.parse_args()
+
+    print(f"pragmas: {SQLITE_PRAGMAS}")
+    print("writers  batch  mode       rows/s   p50 ms   p99 ms  errors")
+    for writers in args.writers:
+        for batch in args.batch:
+            for mode in ("default", "wal"):
+                result = run(mode == "wal", writers, args.rows, batch)
+                print(
+                    f"{writers:>7}  {batch:>5}  {mode:<7}  {result['rows/s']:>9.0f}  "
+                    f"{result['p50 ms']:>7.2f}  {result['p99 ms']:>7.2f}  "
+                    f"{result['errors']:>6}"
+                )
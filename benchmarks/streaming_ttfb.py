@@ -0,0 +1,99 @@
+"""Time to first byte and total time of the dashboard, buffered against streamed.
+
+Responses are driven straight through ASGI, so the numbers include
+Starlette's threadpool hops and one send per chunk but no network.
+
+Run from the repository root: python -m benchmarks.streaming_ttfb
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, ClassVar
+
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+
+from jellyserve.components import Component, Template
+
+
+class Dashboard(Component):
+    streaming: ClassVar[bool] = True
+
+    trade_nodes: list[Any]
+    broker: dict[str, str]
+    currencies: dict[str, Any]
+    status_bar: dict[str, str]
+
+    template: Template = Template("templates/dashboard/dashboard.jinja")
+
+
+def dashboard(tickers: int) -> Dashboard:
+    return Dashboard(
+        trade_nodes=[
+            SimpleNamespace(ticker=f"T{index:04}", active=index % 2 == 0)
+            for index in range(tickers)
+        ],
+        broker={"name": "Broker", "working_hours": "9:30-16:00"},
+        currencies={
+            f"C{index:02}": {"nazev": f"currency {index}", "selected": index == 0}
+            for index in range(30)
+        },
+        status_bar=dict.fromkeys(
+            ("balance", "equity", "margin", "free_margin", "level"), "0"
+        ),
+    )
+
+
+MODES: dict[str, Callable[[Dashboard], Response]] = {
+    "buffered": lambda page: HTMLResponse(page.raw()),
+    # Every Jinja fragment sent on its own
+    "fragments": lambda page: StreamingResponse(
+        page.compiled_template().generate(**vars(page)), media_type="text/html"
+    ),
+    "batched": lambda page: page.html(),
+}
+
+
+async def serve(page: Dashboard, mode: str) -> tuple[float, float, int]:
+    """Seconds to the first body bytes, seconds to the end, body chunks."""
+    first = None
+    chunks = 0
+
+    async def receive() -> dict:
+        await asyncio.Event().wait()
+
+    async def send(message: dict) -> None:
+        nonlocal first, chunks
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks += 1
+            if first is None:
+                first = time.perf_counter() - started
+
+    started = time.perf_counter()
+    response = MODES[mode](page)
+    await response({"type": "http", "method": "GET"}, receive, send)
+    return first, time.perf_counter() - started, chunks
+
+
+async def main(sizes: list[int], runs: int) -> None:
+    print("tickers  mode       chunks   ttfb ms  total ms")
+    for size in sizes:
+        page = dashboard(size)
+        for mode in MODES:
+            await serve(page, mode)
+            results = [await serve(page, mode) for _ in range(runs)]
+            print(
+                f"{size:>7}  {mode:<9}  {results[0][2]:>6}  "
+                f"{statistics.median(r[0] for r in results) * 1000:>8.2f}  "
+                f"{statistics.median(r[1] for r in results) * 1000:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[20, 200, 2000])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.tickers, args.runs))
@@ -0,0 +1,211 @@
+"""Websocket round trips on /sync while HTTP requests query the database.
+
+The app runs in this process without its lifespan, so no trading starts, and
+all traffic goes through ASGI on one event loop, as under uvicorn. HTTP load
+is one of:
+
+- a route that does nothing, for the cost of HTTP itself
+- the user lookup of `get_user` with an unknown session cookie, which always
+  misses the cache, awaited as the handlers do now
+- the same lookup on the blocking session, as the handlers did before
+- the /dashboard and /settings pages, logged in as admin
+
+`--rate` caps the requests per second. With 0 they are sent as fast as the
+loop allows, and then every extra request delays the websocket. Works on a
+scratch copy of dev.sqlite, since logging in as admin/admin replaces the
+stored session token.
+
+Run from the repository root: python -m benchmarks.sync_latency
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+# db reads the path on import
+_scratch = tempfile.TemporaryDirectory()
+os.environ["JELLYFISH_DB"] = os.path.join(_scratch.name, "dev.sqlite")
+shutil.copy("dev.sqlite", os.environ["JELLYFISH_DB"])
+
+import main  # noqa: E402
+from db import orm  # noqa: E402
+from models import User  # noqa: E402
+
+# Name, path and whether the requests are made as the logged in admin
+LOADS = [
+    ("none", None, False),
+    ("noop", "/benchmark/noop", False),
+    ("awaited", "/benchmark/awaited", False),
+    ("blocking", "/benchmark/blocking", False),
+    ("dashboard", "/dashboard", True),
+    ("settings", "/settings", True),
+]
+
+
+async def noop_route():
+    return {}
+
+
+async def awaited_route(request: main.Request):
+    await main.get_user(request)
+    return {}
+
+
+async def blocking_route(request: main.Request):
+    db_session = orm.session()
+    db_session.scalar(
+        select(User)
+        .options(selectinload(User.config))
+        .filter_by(session=request.cookies.get("session"))
+    )
+    db_session.rollback()
+    return {}
+
+
+main.app.add_api_route("/benchmark/noop", noop_route)
+main.app.add_api_route("/benchmark/awaited", awaited_route)
+main.app.add_api_route("/benchmark/blocking", blocking_route)
+
+
+class SyncClient:
+    """Minimal ASGI websocket client for /sync."""
+
+    def __init__(self, session_token: str) -> None:
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        scope = {
+            "type": "websocket",
+            "path": "/sync",
+            "raw_path": b"/sync",
+            "query_string": b"",
+            "root_path": "",
+            "scheme": "ws",
+            "headers": [(b"cookie", f"session={session_token}".encode())],
+            "subprotocols": [],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        self.task = asyncio.create_task(main.app(scope, self.outbox.get, self._send))
+
+    async def _send(self, message: dict) -> None:
+        await self.inbox.put(message)
+
+    async def connect(self) -> None:
+        await self.outbox.put({"type": "websocket.connect"})
+        message = await self.inbox.get()
+        if message["type"] != "websocket.accept":
+            raise RuntimeError(f"/sync refused the connection: {message}")
+
+    async def request(self, message: dict) -> dict:
+        await self.outbox.put(
+            {"type": "websocket.receive", "text": json.dumps(message)}
+        )
+        while True:
+            reply = await self.inbox.get()
+            if reply["type"] == "websocket.send":
+                return json.loads(reply["text"])
+
+    async def close(self) -> None:
+        await self.outbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+async def probe(client: SyncClient, seconds: float, interval: float) -> list[float]:
+    round_trips = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await client.request({"action": "subscribe", "topic": "benchmark"})
+        round_trips.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return round_trips
+
+
+async def load(
+    http: httpx.AsyncClient,
+    path: str,
+    logged_in: bool,
+    interval: float,
+    offset: float,
+    stop: asyncio.Event,
+) -> int:
+    requests = 0
+    # Workers are spread over the interval instead of firing together
+    started = time.perf_counter() + offset
+    await asyncio.sleep(offset)
+    while not stop.is_set():
+        if logged_in:
+            response = await http.get(path)
+        else:
+            response = await http.get(path, cookies={"session": uuid.uuid4().hex})
+        if response.is_server_error:
+            raise RuntimeError(f"{path} failed with {response.status_code}")
+        requests += 1
+        # A server yields on socket I/O between requests, ASGITransport may not
+        await asyncio.sleep(
+            max(0.0, started + requests * interval - time.perf_counter())
+        )
+    return requests
+
+
+async def measure(
+    args: argparse.Namespace, path: str | None, logged_in: bool
+) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://testserver"
+    ) as http:
+        await http.post("/login", data={"username": "admin", "password": "admin"})
+        client = SyncClient(http.cookies["session"])
+        await client.connect()
+
+        stop = asyncio.Event()
+        count = args.concurrency if path else 0
+        interval = args.concurrency / args.rate if args.rate else 0.0
+        workers = [
+            asyncio.create_task(
+                load(http, path, logged_in, interval, index * interval / count, stop)
+            )
+            for index in range(count)
+        ]
+        round_trips = await probe(client, args.seconds, args.interval)
+        stop.set()
+        requests = sum(await asyncio.gather(*workers))
+        await client.close()
+
+    round_trips.sort()
+    return {
+        "http/s": requests / args.seconds,
+        "p50": statistics.median(round_trips) * 1000,
+        "p99": round_trips[int(len(round_trips) * 0.99)] * 1000,
+        "max": round_trips[-1] * 1000,
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    print("http load   http/s   ws p50 ms  ws p99 ms  ws max ms")
+    for name, path, logged_in in LOADS:
+        result = await measure(args, path, logged_in)
+        print(
+            f"{name:<9}  {result['http/s']:>7.0f}  {result['p50']:>9.2f}  "
+            f"{result['p99']:>9.2f}  {result['max']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=100, help="requests/s")
+    parser.add_argument("--interval", type=float, default=0.01)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,69 @@
+"""Cold start cost of loading every template, with and without the bytecode cache.
+
+Each measurement runs in a fresh interpreter, like a new worker process.
+
+Run from the repository root: python -m benchmarks.template_startup
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+MODES = ("environment-per-call", "shared-cold", "shared-warm")
+
+
+def load_templates(mode: str, cache_dir: str) -> float:
+    names = sorted(glob.glob("templates/**/*.jinja", recursive=True))
+    started = time.perf_counter()
+    if mode == "environment-per-call":
+        # What utils.template did before: a new environment for every render
+        for name in names:
+            Environment(loader=FileSystemLoader(".")).get_template(name)
+    else:
+        environment = Environment(
+            loader=FileSystemLoader("."),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+        )
+        for name in names:
+            environment.get_template(name)
+    return time.perf_counter() - started
+
+
+def measure(mode: str, cache_dir: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.template_startup", "--child", mode],
+        env={**os.environ, "BENCHMARK_CACHE": cache_dir},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(load_templates(args.child, os.environ["BENCHMARK_CACHE"]))
+        sys.exit()
+
+    print(f"{len(glob.glob('templates/**/*.jinja', recursive=True))} templates")
+    for mode in MODES:
+        timings = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                if mode == "shared-warm":
+                    # A previous process already filled the cache
+                    measure("shared-cold", cache_dir)
+                timings.append(measure(mode, cache_dir))
+        print(f"{mode:<22} {statistics.median(timings) * 1000:8.2f} ms")
@@ -0,0 +1,81 @@
+"""TickStore append throughput and range query latency.
+
+Ticks of one ticker arrive every `--step` seconds over as many days as they
+take, in a scratch directory (20M ticks are about 340 MB). The graph history
+of each range is reduced to `MAX_POINTS` either on the day files, as
+`history.stored_history` does, or after joining the range into pandas.
+
+Run from the repository root: python -m benchmarks.tick_store
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from charts import MAX_POINTS, downsample, reduce_ticks
+from tickstore import DAY, TickStore
+
+RANGES = {"1 minute": 60, "1 hour": 3600, "1 day": DAY, "7 days": 7 * DAY}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=20_000_000)
+    parser.add_argument("--step", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    start = time.time() - args.ticks * args.step
+    end = start + args.ticks * args.step
+    with tempfile.TemporaryDirectory() as directory:
+        store = TickStore(directory)
+        elapsed = 0.0
+        # Generated a million at a time to keep memory flat
+        for offset in range(0, args.ticks, 1_000_000):
+            count = min(1_000_000, args.ticks - offset)
+            timestamps = (start + (offset + np.arange(count)) * args.step).tolist()
+            prices = rng.uniform(50, 150, count).tolist()
+            started = time.perf_counter()
+            for timestamp, price in zip(timestamps, prices):
+                store.append("BENCH", timestamp, price, 0)
+            elapsed += time.perf_counter() - started
+        store.flush()
+        days = len(list(store.root.glob("BENCH/*.ticks")))
+        print(f"append  {args.ticks / elapsed / 1e6:.2f}M ticks/s, {days} day files")
+
+        for name, seconds in RANGES.items():
+            latencies = []
+            for _ in range(20):
+                first = rng.uniform(start, max(start, end - seconds))
+                started = time.perf_counter()
+                ticks = store.range("BENCH", first, first + seconds)
+                latencies.append(time.perf_counter() - started)
+            print(
+                f"range {name:<8} {len(ticks):>10} ticks "
+                f"{np.median(latencies) * 1000:>9.2f} ms"
+            )
+
+        def joined(first: float, last: float) -> pd.DataFrame:
+            ticks = store.range("BENCH", first, last)
+            index = pd.to_datetime(ticks["t"], unit="s")
+            history = pd.DataFrame({"price": ticks["p"]}, index=index)
+            return downsample(history, MAX_POINTS)
+
+        def segments(first: float, last: float) -> np.ndarray:
+            return reduce_ticks(store.segments("BENCH", first, last), MAX_POINTS)
+
+        print(f"graph to {MAX_POINTS} points    day files     joined")
+        for name, seconds in RANGES.items():
+            medians = []
+            for reduce in (segments, joined):
+                latencies = []
+                for _ in range(5):
+                    first = rng.uniform(start, max(start, end - seconds))
+                    started = time.perf_counter()
+                    reduce(first, first + seconds)
+                    latencies.append(time.perf_counter() - started)
+                medians.append(np.median(latencies) * 1000)
+            print(f"graph {name:<8} {medians[0]:>14.2f} ms {medians[1]:>7.2f} ms")
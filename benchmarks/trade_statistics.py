@@ -0,0 +1,121 @@
+"""TradeStatistics over a generated Trades table, a million rows by default.
+
+Trades are spread over two years and 50 tickers in a scratch SQLite file.
+Times `load` without and with the Trades indexes, `apply` per trade and
+`view`, and checks that loading and replaying every trade through `apply`
+give the same totals.
+
+Run from the repository root: python -m benchmarks.trade_statistics
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from db import orm
+from jellyserve.orm import _set_sqlite_pragmas
+from models import Trade
+from trading import TradeState
+from tradestats import GLOBAL, WINDOWS, TradeStatistics
+
+FEE_RATE = 0.001
+
+
+def generate(count: int, tickers: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    now = datetime.now()
+    names = [f"T{index}" for index in range(tickers)]
+    trades = []
+    for _ in range(count):
+        opened = now - timedelta(seconds=rng.random() * 730 * 86400)
+        opening_price = rng.uniform(10, 100)
+        trade = {
+            "trade_server_id": rng.choice(names),
+            "side": rng.choice([TradeState.BOUGHT.value, TradeState.SHORTING.value]),
+            "amount": rng.randint(1, 10),
+            "opening_price": opening_price,
+            "opened": opened,
+            "closing_price": None,
+            "closed": None,
+        }
+        # A few positions are still open
+        if rng.random() >= 0.0005:
+            trade["closed"] = min(now, opened + timedelta(seconds=rng.random() * 3600))
+            trade["closing_price"] = opening_price * rng.uniform(0.95, 1.05)
+        trades.append(trade)
+    return trades
+
+
+def timed(label: str, function, *args) -> float:
+    started = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1000:>10.1f} ms")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=1_000_000)
+    parser.add_argument("--tickers", type=int, default=50)
+    args = parser.parse_args()
+
+    trades = generate(args.trades, args.tickers)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.sqlite')}")
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        orm.Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(Trade.__table__.insert(), trades)
+        session_factory = sessionmaker(bind=engine)
+        print(f"{args.trades} trades, {args.tickers} tickers")
+
+        loaded = TradeStatistics(FEE_RATE)
+        with engine.begin() as connection:
+            for index in Trade.__table__.indexes:
+                index.drop(connection)
+        timed("load, no indexes", loaded.load, session_factory)
+        with engine.begin() as connection:
+            for index in Trade.__table__.indexes:
+                index.create(connection)
+        timed("load, indexes", loaded.load, session_factory)
+        engine.dispose()
+
+    # Replay in the order the trade nodes publish: opened, then closed
+    replayed = TradeStatistics(FEE_RATE)
+    since = datetime.combine(
+        TradeStatistics._oldest(datetime.now().date()), datetime.min.time()
+    )
+    messages = []
+    for trade in trades:
+        message = {"ticker": trade["trade_server_id"], **trade}
+        if trade["closed"] is None:
+            messages.append(message)
+        elif trade["closed"] >= since:
+            messages.append({**message, "closed": None, "closing_price": None})
+            messages.append(message)
+    elapsed = timed(
+        f"apply x {len(messages)}",
+        lambda: [replayed.apply(message) for message in messages],
+    )
+    print(f"{'apply per message':<32} {elapsed / len(messages) * 1e6:>10.2f} µs")
+
+    repeat = 1000
+    elapsed = timed(
+        f"view x {repeat}", lambda: [loaded.view(GLOBAL, "USD") for _ in range(repeat)]
+    )
+    print(f"{'view per call':<32} {elapsed / repeat * 1000:>10.3f} ms")
+
+    for ticker in ("T0", GLOBAL):
+        for window in WINDOWS:
+            assert (
+                loaded.window(ticker, window).display("USD")
+                == replayed.window(ticker, window).display("USD")
+            ), (ticker, window)
+    print("load and apply agree on every window")
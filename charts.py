@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from tickstore import TICK
+
+# Upper bound on the points of a graph_sync response, whatever the client asks
+MAX_POINTS = 5000
+
+
+def min_max_indexes(values: np.ndarray, max_points: int) -> np.ndarray:
+    """Indexes of at most `max_points` values that keep the shape of the series.
+
+    The values are split into equal buckets and the lowest and highest value
+    of each bucket are kept in their original order, together with the first
+    and last value, so spikes survive however far the series is reduced. NaN
+    values are never picked as a low or high.
+    """
+    count = len(values)
+    if count <= max_points:
+        return np.arange(count)
+    if max_points < 4:
+        return np.array([0, count - 1])[:max_points]
+
+    buckets = (max_points - 2) // 2
+    size = -(-count // buckets)
+    buckets = -(-count // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:count] = values
+    padded = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    # nanargmin raises on buckets without a single number
+    filled = ~np.isnan(padded).all(axis=1)
+    padded, offsets = padded[filled], offsets[filled]
+    lows = offsets + np.nanargmin(padded, axis=1)
+    highs = offsets + np.nanargmax(padded, axis=1)
+    # np.unique sorts, which also puts each bucket's low and high in order
+    return np.unique(np.concatenate(([0, count - 1], lows, highs)))
+
+
+def point_budget(max_points: object = None) -> int:
+    """Points of a graph_sync response for what the client asked for."""
+    if not isinstance(max_points, int) or max_points < 1:
+        return MAX_POINTS
+    return min(max_points, MAX_POINTS)
+
+
+def reduce_ticks(segments: list[np.ndarray], max_points: int) -> np.ndarray:
+    """At most `max_points` of the `TICK` records in `segments`, e.g. the day
+    files of `TickStore.segments`, picked by `min_max_indexes` on the prices.
+
+    Each segment is reduced on its own, with a share of `max_points` by its
+    length, so only the picked records are copied out of it.
+    """
+    total = sum(len(segment) for segment in segments)
+    if total <= max_points:
+        return np.concatenate(segments) if segments else np.empty(0, TICK)
+
+    picked = []
+    for segment in segments:
+        budget = max_points * len(segment) // total
+        picked.append(segment[min_max_indexes(segment["p"], budget)])
+    return np.concatenate(picked)
+
+
+def downsample(history: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """At most `max_points` rows of `history`, picked on its "price" column."""
+    # Gaps in the history are NaN, which JSON clients cannot parse either
+    history = history.dropna(subset=["price"])
+    if len(history) <= max_points:
+        return history
+    prices = history["price"].to_numpy(dtype=np.float64)
+    return history.iloc[min_max_indexes(prices, max_points)]
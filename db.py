@@ -1,6 +1,10 @@
+import os
+
 from sqlalchemy import MetaData
 from jellyserve.orm import ORM
 
-orm = ORM("sqlite:///dev.sqlite")
+DATABASE = os.environ.get("JELLYFISH_DB", "dev.sqlite")
+
+orm = ORM(f"sqlite:///{DATABASE}", async_engine=f"sqlite+aiosqlite:///{DATABASE}")
 session = orm.session
 meta = MetaData()
@@ -0,0 +1,136 @@
+import asyncio
+import os
+from multiprocessing import Process, Queue
+from queue import Empty, SimpleQueue
+
+from bars import BarBuilder
+from db import session
+from models import TradeNode
+from persistence import trade_writer
+from trading import SettingsSnapshot
+
+# Sent on a shard's control queue to stop all of its trade nodes
+STOP = None
+
+
+async def _control(control_queue: Queue, nodes: list[TradeNode], node_queues):
+    while any(node.active for node in nodes):
+        try:
+            message = control_queue.get_nowait()
+        except Empty:
+            await asyncio.sleep(0.1)
+            continue
+
+        if message is STOP:
+            for node in nodes:
+                node.active = False
+        else:
+            for node_queue in node_queues:
+                node_queue.put(message)
+
+
+async def _trade(
+    node: TradeNode,
+    sync_queue: Queue,
+    settings: SettingsSnapshot,
+    node_queue: SimpleQueue,
+    bars: BarBuilder,
+) -> None:
+    # One failing ticker must not take the other nodes of its shard down
+    try:
+        await node.trade(sync_queue, settings, node_queue, bars)
+    except Exception as error:
+        print(f"Trade node {node.ticker} failed: {error!r}")
+    finally:
+        node.active = False
+
+
+async def _run_shard(
+    tickers: list[str],
+    sync_queue: Queue,
+    settings: SettingsSnapshot,
+    control_queue: Queue,
+) -> None:
+    nodes = [session.query(TradeNode).filter_by(ticker=t).first() for t in tickers]
+    node_queues = [SimpleQueue() for _ in nodes]
+    # Candles of every ticker of the shard, read by the strategies
+    bars = BarBuilder()
+    await asyncio.gather(
+        _control(control_queue, nodes, node_queues),
+        *(
+            _trade(node, sync_queue, settings, node_queue, bars)
+            for node, node_queue in zip(nodes, node_queues)
+        ),
+    )
+
+
+def run_shard(
+    tickers: list[str],
+    sync_queue: Queue,
+    settings: SettingsSnapshot,
+    control_queue: Queue,
+) -> None:
+    try:
+        asyncio.run(_run_shard(tickers, sync_queue, settings, control_queue))
+    finally:
+        # Child processes skip atexit handlers, so flush pending trades here
+        trade_writer.stop()
+
+
+class TradingEngine:
+    """Runs trade nodes as coroutines instead of one process per ticker.
+
+    Tickers are dealt round-robin onto shards, one process and event loop per
+    shard, with at most one shard per CPU. Within a shard every node yields to
+    the loop after each price, so the nodes take turns tick by tick.
+    """
+
+    def __init__(self, sync_queue: Queue, shards: int | None = None) -> None:
+        self.sync_queue = sync_queue
+        self.shards = shards or os.cpu_count() or 1
+        self.processes: list[Process] = []
+        self.control_queues: list[Queue] = []
+        self.tickers: list[str] = []
+
+    def start(self, tickers: list[str], settings: SettingsSnapshot) -> None:
+        shards = min(self.shards, len(tickers))
+        for shard in range(shards):
+            control_queue = Queue()
+            process = Process(
+                target=run_shard,
+                args=(tickers[shard::shards], self.sync_queue, settings, control_queue),
+                name=f"trading-shard-{len(self.processes)}",
+            )
+            process.start()
+            self.processes.append(process)
+            self.control_queues.append(control_queue)
+        self.tickers.extend(tickers)
+
+        stats = self.stats()
+        print(
+            f"Trading {stats['tickers']} tickers on {stats['shards']} shards "
+            f"({stats['tickers_per_core']:.1f} tickers per core)"
+        )
+
+    def publish(self, settings: SettingsSnapshot) -> None:
+        for control_queue in self.control_queues:
+            control_queue.put(settings)
+
+    def stop(self, timeout: float = 10) -> None:
+        for control_queue in self.control_queues:
+            control_queue.put(STOP)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+        self.processes.clear()
+        self.control_queues.clear()
+        self.tickers.clear()
+
+    def stats(self) -> dict[str, float]:
+        shards = len(self.processes)
+        return {
+            "tickers": len(self.tickers),
+            "shards": shards,
+            "tickers_per_core": len(self.tickers) / shards if shards else 0.0,
+        }
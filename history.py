@@ -0,0 +1,123 @@
+import asyncio
+import re
+import time
+from datetime import datetime
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import yfinance
+
+from charts import downsample, reduce_ticks
+from jellyserve.utils import TTLCache
+from protocol import STATES
+from tickstore import DAY, tick_store
+
+# (ticker, period such as "7d", max_points) -> at most max_points rows of
+# "price" and "state" indexed by time
+HistorySource = Callable[[str, str, int], pd.DataFrame]
+
+# Lengths of the yfinance periods, e.g. "5d", "3mo", "1y"
+PERIOD_UNITS = {"d": DAY, "mo": 30 * DAY, "y": 365 * DAY}
+
+
+def yfinance_history(ticker: str, period: str) -> pd.Series:
+    return yfinance.Ticker(ticker).history(period=period)["Close"]
+
+
+def period_start(period: str, now: float) -> float | None:
+    """Epoch seconds where a yfinance `period` starts, None for "max"."""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return datetime.fromtimestamp(now).replace(
+            month=1, day=1, hour=0, minute=0, second=0, microsecond=0
+        ).timestamp()
+    match = re.fullmatch(r"(\d+)(d|mo|y)", period)
+    if match is None:
+        raise ValueError(f"Unknown period {period!r}")
+    return now - int(match[1]) * PERIOD_UNITS[match[2]]
+
+
+def remote_history(ticker: str, period: str) -> pd.DataFrame:
+    prices = yfinance_history(ticker, period)
+    # No trade node saw these prices
+    return pd.DataFrame({"price": prices, "state": "noop"}, index=prices.index)
+
+
+def stored_history(ticker: str, period: str, max_points: int) -> pd.DataFrame:
+    """Prices and states recorded by the trade nodes (see `tickstore`), from
+    yfinance for the part of `period` before the first recorded tick.
+
+    The recorded ticks are reduced to `max_points` on the memory-mapped day
+    files (see `charts.reduce_ticks`) before any pandas object is built.
+    """
+    start = period_start(period, time.time())
+    ticks = reduce_ticks(tick_store.segments(ticker, start), max_points)
+    if len(ticks) == 0:
+        return downsample(remote_history(ticker, period), max_points)
+
+    local = datetime.now().astimezone().tzinfo
+    index = pd.to_datetime(ticks["t"], unit="s", utc=True).tz_convert(local)
+    recorded = pd.DataFrame(
+        {"price": ticks["p"], "state": np.array(STATES)[ticks["s"]]}, index=index
+    )
+    if start is not None and tick_store.first(ticker) <= start:
+        return recorded
+
+    try:
+        remote = remote_history(ticker, period).tz_convert(local)
+    except Exception as error:
+        print(f"Showing only recorded history of {ticker}: {error!r}")
+        return recorded
+    history = pd.concat([remote[remote.index < recorded.index[0]], recorded])
+    return downsample(history, max_points)
+
+
+class HistoryCache:
+    """Price history lookups that never block the event loop.
+
+    `source` is called in a worker thread. Results are kept for `ttl` seconds
+    per (ticker, period, max_points), and concurrent lookups of the same key share one
+    call. Failed lookups are not cached.
+    """
+
+    def __init__(
+        self,
+        source: HistorySource = stored_history,
+        ttl: float = 60.0,
+        maxsize: int = 128,
+    ) -> None:
+        self.source = source
+        self.cache = TTLCache(maxsize, ttl)
+        self.fetches = 0
+        self._in_flight: dict[tuple[str, str, int], asyncio.Future] = {}
+
+    async def get(self, ticker: str, period: str, max_points: int) -> pd.DataFrame:
+        key = (ticker, period, max_points)
+        history = self.cache.get(key)
+        if history is not None:
+            return history
+
+        fetch = self._in_flight.get(key)
+        if fetch is None:
+            fetch = self._in_flight[key] = asyncio.ensure_future(self._fetch(key))
+        # A cancelled caller must not cancel the fetch for everyone else
+        return await asyncio.shield(fetch)
+
+    async def _fetch(self, key: tuple[str, str, int]) -> pd.DataFrame:
+        try:
+            self.fetches += 1
+            history = await asyncio.to_thread(self.source, *key)
+            self.cache.put(key, history)
+            return history
+        finally:
+            del self._in_flight[key]
+
+    def metrics(self) -> dict[str, float | int]:
+        return {
+            "size": len(self.cache),
+            "fetches": self.fetches,
+            "in_flight": len(self._in_flight),
+            "hit_rate": self.cache.hit_rate,
+        }
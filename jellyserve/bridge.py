@@ -0,0 +1,85 @@
+import asyncio
+import time
+from multiprocessing import Queue
+from queue import Empty
+from threading import Event, Thread
+
+
+class QueueBridge:
+    """Moves messages from a multiprocessing queue onto the event loop.
+
+    A reader thread blocks on the queue, drains whatever else is waiting (up to
+    `max_batch` messages) and hands the batch to the loop, so consumers await
+    whole batches instead of polling. Messages carrying a `sent_at` epoch
+    timestamp are used to measure the end-to-end lag; the key is removed.
+    """
+
+    def __init__(self, queue: Queue, max_batch: int = 500) -> None:
+        self.queue = queue
+        self.max_batch = max_batch
+        self.received = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._batches: asyncio.Queue[list[dict]] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopped = Event()
+        self._thread: Thread | None = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._batches = asyncio.Queue()
+        self._stopped.clear()
+        self._thread = Thread(target=self._read, name="queue-bridge", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _read(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                # Wakes up now and then to notice stop()
+                batch = [self.queue.get(timeout=0.5)]
+            except Empty:
+                continue
+
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            self._loop.call_soon_threadsafe(self._batches.put_nowait, batch)
+
+    async def get(self) -> list[dict]:
+        batch = await self._batches.get()
+        now = time.time()
+        for message in batch:
+            sent_at = message.pop("sent_at", None)
+            if sent_at is not None:
+                self.lag = now - sent_at
+                self.max_lag = max(self.max_lag, self.lag)
+        self.received += len(batch)
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> list[dict]:
+        return await self.get()
+
+    def metrics(self) -> dict[str, float | int | None]:
+        try:
+            depth = self.queue.qsize()
+        except NotImplementedError:
+            # Not available on macOS
+            depth = None
+        return {
+            "queue_depth": depth,
+            "pending_batches": self._batches.qsize() if self._batches else 0,
+            "received": self.received,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+        }
@@ -1,8 +1,14 @@
-from jinja2 import Environment, BaseLoader
+import hashlib
+import os
+from typing import AsyncIterator, ClassVar, Iterator
+
+from jinja2 import Template as JinjaTemplate
 from pydantic import BaseModel
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from dataclasses import dataclass
 
+from jellyserve.utils import DEBUG, LRUCache, environment
+
 
 @dataclass
 class Template:
@@ -12,20 +18,143 @@ class Template:
         with open(self.path, encoding="utf-8") as f:
             return f.read()
 
+    def mtime(self) -> float:
+        return os.stat(self.path).st_mtime
+
+    def loader_name(self) -> str | None:
+        """Name of the template for the environment's loader, which looks in
+        the working directory, None for paths outside of it."""
+        name = os.path.relpath(os.path.abspath(self.path))
+        if name == os.pardir or name.startswith(os.pardir + os.sep):
+            return None
+        return name.replace(os.sep, "/")
+
+
+class TemplateCache:
+    """Process-wide cache of compiled templates keyed by template path.
+
+    With `auto_reload` the file mtime is checked on every lookup and the
+    template is recompiled when it changes, otherwise the file is compiled once.
+    Compilation goes through the shared environment and its bytecode cache.
+    """
+
+    def __init__(self, auto_reload: bool = DEBUG) -> None:
+        self.auto_reload = auto_reload
+        self.hits = 0
+        self.misses = 0
+        self._templates: dict[str, tuple[float | None, JinjaTemplate]] = {}
+        self._sources: dict[str, JinjaTemplate] = {}
+
+    def get(self, template: Template) -> JinjaTemplate:
+        mtime = template.mtime() if self.auto_reload else None
+        cached = self._templates.get(template.path)
+        if cached is not None and (not self.auto_reload or cached[0] == mtime):
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        name = template.loader_name()
+        if name is None:
+            compiled = environment.from_string(template.read())
+        else:
+            compiled = environment.get_template(name)
+        self._templates[template.path] = (mtime, compiled)
+        return compiled
+
+    def from_string(self, source: str) -> JinjaTemplate:
+        compiled = self._sources.get(source)
+        if compiled is None:
+            compiled = self._sources[source] = environment.from_string(source)
+        return compiled
+
+    def clear(self) -> None:
+        self._templates.clear()
+        self._sources.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def metrics(self) -> dict[str, float | int]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._templates),
+            "sources": len(self._sources),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+template_cache = TemplateCache()
+fragment_cache = LRUCache(maxsize=256)
+
+# Characters of a streamed page collected before they are sent
+STREAM_CHUNK_SIZE = 4096
+
+
+async def batched(
+    chunks: Iterator[str], size: int = STREAM_CHUNK_SIZE
+) -> AsyncIterator[str]:
+    """Join Jinja's many small fragments into chunks of at least `size`.
+
+    Rendering a chunk takes microseconds, so it happens on the event loop:
+    Starlette would hop to the threadpool for every step of a sync iterator,
+    and send every fragment separately.
+    """
+    batch: list[str] = []
+    length = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(batch)
+            batch, length = [], 0
+    if batch:
+        yield "".join(batch)
+
 
 class Component(BaseModel, arbitrary_types_allowed=True):
-    def html(self) -> HTMLResponse:
-        template = self.template
+    # Stream the page out while it renders instead of building one string
+    streaming: ClassVar[bool] = False
+    # Reuse the rendered HTML for as long as the field values stay the same
+    cache_fragments: ClassVar[bool] = False
+
+    def compiled_template(self) -> JinjaTemplate:
         if isinstance(self.template, Template):
-            template = self.template.read()
+            return template_cache.get(self.template)
 
-        return HTMLResponse(
-            Environment(loader=BaseLoader).from_string(template).render(**vars(self))
-        )
+        return template_cache.from_string(self.template)
+
+    def html(self) -> HTMLResponse | StreamingResponse:
+        if self.streaming:
+            return StreamingResponse(
+                batched(self.compiled_template().generate(**vars(self))),
+                media_type="text/html",
+            )
+
+        return HTMLResponse(self.raw())
+
+    def fragment_key(self) -> tuple[str, int, str]:
+        # The compiled template changes identity when it is reloaded from disk
+        digest = hashlib.sha256(repr(vars(self)).encode("utf-8")).hexdigest()
+        return type(self).__qualname__, id(self.compiled_template()), digest
+
+    def invalidate(self) -> None:
+        fragment_cache.pop(self.fragment_key())
+
+    @classmethod
+    def invalidate_all(cls) -> None:
+        """Drop the cached fragments of every instance of this component, for
+        when the data behind them changed."""
+        name = cls.__qualname__
+        fragment_cache.pop_if(lambda key: key[0] == name)
 
     def raw(self) -> str:
-        template = self.template
-        if isinstance(self.template, Template):
-            template = self.template.read()
+        if not self.cache_fragments:
+            return self.compiled_template().render(**vars(self))
 
-        return Environment(loader=BaseLoader).from_string(template).render(**vars(self))
+        key = self.fragment_key()
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            fragment = self.compiled_template().render(**vars(self))
+            fragment_cache.put(key, fragment)
+        return fragment
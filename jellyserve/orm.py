@@ -1,13 +1,92 @@
-from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+# Applied to every new SQLite connection: readers no longer block the writer
+# and commits only fsync at WAL checkpoints.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+    "temp_store": "MEMORY",
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
 
 
 class ORM:
-    def __init__(self, engine: str = "sqlite:///dev.db", echo: bool = False):
+    def __init__(
+        self,
+        engine: str = "sqlite:///dev.db",
+        echo: bool = False,
+        async_engine: str | None = None,
+    ):
         self.Base = declarative_base()
         self._engine = create_engine(engine, echo=echo)
-        _Session = sessionmaker(bind=self._engine, expire_on_commit=False)
-        self.session = _Session()
+        if self._engine.dialect.name == "sqlite":
+            event.listen(self._engine, "connect", _set_sqlite_pragmas)
+
+        self.Session = sessionmaker(bind=self._engine, expire_on_commit=False)
+        # Proxy to one session per thread, safe to import as a global
+        self.session = scoped_session(self.Session)
+
+        # Awaitable sessions for request handlers, e.g. "sqlite+aiosqlite:///..."
+        self._async_engine = None
+        self.async_session = None
+        if async_engine is not None:
+            self._async_engine = create_async_engine(async_engine, echo=echo)
+            if self._async_engine.dialect.name == "sqlite":
+                event.listen(
+                    self._async_engine.sync_engine, "connect", _set_sqlite_pragmas
+                )
+            self.async_session = async_sessionmaker(
+                self._async_engine, expire_on_commit=False
+            )
+
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # Pooled connections and sessions belong to the parent process
+        self._engine.dispose(close=False)
+        if self._async_engine is not None:
+            self._async_engine.sync_engine.dispose(close=False)
+        self.session.registry.clear()
 
     def migrate(self):
         self.Base.metadata.create_all(self._engine)
+
+        # create_all skips tables that already exist, so add the nullable
+        # columns and the indexes they are missing
+        with self._engine.begin() as connection:
+            inspector = inspect(connection)
+            dialect = connection.dialect
+            for table in self.Base.metadata.sorted_tables:
+                existing = {c["name"] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    definition = CreateColumn(column).compile(dialect=dialect)
+                    connection.execute(
+                        text(f'ALTER TABLE "{table.name}" ADD COLUMN {definition}')
+                    )
+                # Indexes whose definition changed are rebuilt
+                existing = {
+                    i["name"]: i["column_names"]
+                    for i in inspector.get_indexes(table.name)
+                }
+                for index in table.indexes:
+                    columns = [column.name for column in index.columns]
+                    if existing.get(index.name) == columns:
+                        continue
+                    if index.name in existing:
+                        index.drop(connection)
+                    index.create(connection)
@@ -0,0 +1,125 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+from enum import Enum
+from typing import Hashable
+
+from starlette.websockets import WebSocket
+
+
+class OverflowPolicy(str, Enum):
+    # Drop the oldest pending frame
+    DROP = "drop"
+    # Replace a pending frame with the same key, drop the oldest otherwise
+    CONFLATE = "conflate"
+
+
+class SocketWriter:
+    """Bounded outbound queue plus a writer task for a single websocket.
+
+    Frames are already serialized, text or binary, so a broadcast encodes its
+    message once and pushes the same frame to every writer. `push` never waits
+    on the network; when the queue is full the overflow policy makes room. A
+    client that keeps overflowing without ever catching up is reported as too
+    slow.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_pending: int = 256,
+        policy: OverflowPolicy = OverflowPolicy.CONFLATE,
+        max_overflows: int = 1000,
+    ) -> None:
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.policy = policy
+        self.max_overflows = max_overflows
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self._overflows = 0
+        self._pending: OrderedDict[Hashable, str | bytes] = OrderedDict()
+        # Pending frames pushed with `force`, they do not count against the bound
+        self._forced = 0
+        self._sequence = itertools.count()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._write())
+
+    @property
+    def closed(self) -> bool:
+        return self._task.done()
+
+    @property
+    def slow(self) -> bool:
+        return self._overflows > self.max_overflows
+
+    def push(
+        self, frame: str | bytes, key: Hashable | None = None, force: bool = False
+    ) -> bool:
+        """Queue a frame, returns False once the client is too slow to keep.
+
+        Frames with a `key` replace a pending frame with the same key under the
+        CONFLATE policy. `force` frames, e.g. replies to requests, are never
+        dropped or conflated and may exceed the bound.
+        """
+        if self.closed:
+            return False
+
+        if force:
+            self._forced += 1
+            key = ("force", next(self._sequence))
+        elif key is not None and self.policy is OverflowPolicy.CONFLATE:
+            key = ("key", key)
+            if key in self._pending:
+                self._pending[key] = frame
+                self.conflated += 1
+                return True
+        else:
+            key = ("seq", next(self._sequence))
+
+        if not force and len(self._pending) - self._forced >= self.max_pending:
+            # Make room with the oldest frame that may be dropped
+            oldest = next(old for old in self._pending if old[0] != "force")
+            del self._pending[oldest]
+            self.dropped += 1
+            self._overflows += 1
+
+        self._pending[key] = frame
+        self._ready.set()
+        return not self.slow
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._pending:
+                    key, frame = self._pending.popitem(last=False)
+                    if key[0] == "force":
+                        self._forced -= 1
+                    if isinstance(frame, bytes):
+                        await self.websocket.send_bytes(frame)
+                    else:
+                        await self.websocket.send_text(frame)
+                    self.sent += 1
+                # Caught up, so earlier overflows no longer count against it
+                self._overflows = 0
+                self._ready.clear()
+        except Exception:
+            # The socket is gone, the receiving side removes the connection
+            pass
+
+    async def close(self, code: int = 1000) -> None:
+        self._task.cancel()
+        try:
+            await self.websocket.close(code)
+        except Exception:
+            pass
+
+    def metrics(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+        }
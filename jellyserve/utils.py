@@ -1,12 +1,36 @@
-from jinja2 import Template
-from typing import Any
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
 
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from jinja2 import Template, select_autoescape
+from typing import Any, Callable, Hashable
+
+# Templates are checked for changes on disk unless running in production
+DEBUG = os.environ.get("JELLYSERVE_ENV", "development") != "production"
+BYTECODE_CACHE_DIR = os.environ.get("JELLYSERVE_BYTECODE_CACHE", ".jinja_cache")
+
+
+class _BytecodeCache(FileSystemBytecodeCache):
+    # The directory is created when the first template is stored, not on import
+    def dump_bytecode(self, bucket) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
 
-def template(location: str, **kwargs) -> Template:
-    from jinja2 import Environment, PackageLoader, select_autoescape
 
-    env = Environment(loader=PackageLoader("main"), autoescape=select_autoescape())
-    _template = env.get_template(location)
+# Shared by every render in the process; compiled bytecode is persisted to disk
+# so new workers and cold starts load templates without recompiling them.
+environment = Environment(
+    loader=FileSystemLoader("."),
+    bytecode_cache=_BytecodeCache(BYTECODE_CACHE_DIR),
+    autoescape=select_autoescape(default_for_string=False),
+    auto_reload=DEBUG,
+)
+
+
+def template(location: str, **kwargs) -> Template:
+    _template = environment.get_template(f"templates/{location}")
     return _template.render(**kwargs)
 
 
@@ -15,3 +39,93 @@ def sha512(text: Any) -> str:
 
     encoded_text = str(text).encode("utf-8")
     return hashlib.sha512(encoded_text).hexdigest()
+
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def pop_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches `predicate`, returns how many."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def metrics(self) -> dict[str, float | int]:
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries also expire `ttl` seconds after being stored."""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0) -> None:
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._data.pop(key, None)
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = super().pop(key)
+        return default if entry is None else entry[1]
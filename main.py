@@ -1,162 +1,363 @@
 import asyncio
+import inspect
+import json
+import os
 import random
+from collections import deque
 from contextlib import asynccontextmanager
-from multiprocessing import Process, Queue
+from dataclasses import asdict
+from multiprocessing import Queue
+from typing import Callable, Hashable
 
 import pandas as pd
+import requests
 import requests_cache
-import yfinance
 from fastapi import FastAPI, WebSocket
 from fastapi import Request
 from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from result import Result, Ok, Err, is_ok, is_err
-
-from db import session
-from jellyserve.components import Component, Template
-from jellyserve.utils import sha512
-from models import User, TradeNode, Settings
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+
+import protocol
+from bars import RESOLUTIONS, BarBuilder
+from charts import point_budget
+from db import DATABASE, orm
+from engine import TradingEngine
+from history import HistoryCache
+from jellyserve.bridge import QueueBridge
+from jellyserve.components import Component, Template, fragment_cache, template_cache
+from jellyserve.sockets import OverflowPolicy, SocketWriter
+from jellyserve.utils import TTLCache, sha512
+from models import User, TradeNode, Settings, Config
 from trading import Broker
+from tradestats import GLOBAL, WINDOWS, TradeStatistics
 
+# Seconds over which a ticker's graph updates are merged into one frame
+GRAPH_INTERVAL = float(os.environ.get("JELLYFISH_GRAPH_INTERVAL", 0.25))
 
-class SyncConnectionManager:
-    def __init__(self) -> None:
-        self.active_connections: dict[User, WebSocket | None] = {}
-
-    def add_connection(self, user: User, websocket: WebSocket):
-        self.active_connections[user] = websocket
 
-    def remove_connection(self, user: User):
-        del self.active_connections[user]
+class SyncConnectionManager:
+    """Fans messages out to every /sync connection without waiting on any of them.
+
+    Each connection gets its own bounded queue and writer task (see
+    `SocketWriter`), so a slow browser only falls behind itself. Clients that
+    keep overflowing are disconnected. Clients that negotiated the binary
+    subprotocol get graph updates as compact frames (see `protocol`).
+
+    Messages published to a topic, e.g. a ticker, only go to the sockets
+    subscribed to it, the rest go to everyone.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = 256,
+        policy: OverflowPolicy = OverflowPolicy.CONFLATE,
+    ) -> None:
+        self.max_pending = max_pending
+        self.policy = policy
+        self.active_connections: dict[WebSocket, tuple[User, SocketWriter]] = {}
+        self.binary: set[WebSocket] = set()
+        self.topics: dict[str, set[WebSocket]] = {}
+        self.ticker_ids = protocol.TickerIds()
+        self.slow_disconnects = 0
+
+    def add_connection(
+        self, user: User, websocket: WebSocket, subprotocol: str | None = None
+    ):
+        writer = SocketWriter(websocket, self.max_pending, self.policy)
+        self.active_connections[websocket] = (user, writer)
+        if subprotocol == protocol.BINARY:
+            self.binary.add(websocket)
+            writer.push(self.encode(protocol.schema(self.ticker_ids)), force=True)
+
+    def remove_connection(self, websocket: WebSocket, code: int = 1000):
+        self.binary.discard(websocket)
+        for topic in list(self.topics):
+            self.unsubscribe(websocket, topic)
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None:
+            asyncio.create_task(connection[1].close(code))
+
+    def subscribe(self, websocket: WebSocket, topic: str):
+        self.topics.setdefault(topic, set()).add(websocket)
+
+    def unsubscribe(self, websocket: WebSocket, topic: str):
+        subscribers = self.topics.get(topic)
+        if subscribers is None:
+            return
+        subscribers.discard(websocket)
+        if not subscribers:
+            del self.topics[topic]
 
-    async def send_json(self, _dict: dict, user: User):
-        await self.active_connections[user].send_json(_dict)
+    @staticmethod
+    def encode(_dict: dict) -> str:
+        return json.dumps(_dict, separators=(",", ":"), ensure_ascii=False)
+
+    async def send_json(self, _dict: dict, websocket: WebSocket):
+        # Replies go through the same queue so frames never interleave
+        _, writer = self.active_connections[websocket]
+        writer.push(self.encode(_dict), force=True)
+
+    def _recipients(
+        self, topic: str | None, where: Callable[[User], bool] | None = None
+    ) -> list[WebSocket]:
+        if topic is None:
+            recipients = list(self.active_connections)
+        else:
+            recipients = list(self.topics.get(topic, ()))
+        if where is None:
+            return recipients
+        return [ws for ws in recipients if where(self.active_connections[ws][0])]
+
+    def users(self, topic: str | None = None) -> list[User]:
+        return [self.active_connections[ws][0] for ws in self._recipients(topic)]
+
+    async def broadcast_json(
+        self,
+        _dict: dict,
+        key: Hashable | None = None,
+        topic: str | None = None,
+        where: Callable[[User], bool] | None = None,
+    ):
+        """Queue a message for every client, or the subscribers of `topic`,
+        optionally only those whose user passes `where`.
+
+        `key` lets newer values replace pending ones (see
+        `OverflowPolicy.CONFLATE`).
+        """
+        recipients = self._recipients(topic, where)
+        if recipients:
+            text = self.encode(_dict)
+            self._broadcast(recipients, text, text, key)
+
+    async def broadcast_graph(self, ticker: str, points: list[protocol.Point]):
+        recipients = self._recipients(ticker)
+        binary = [websocket for websocket in recipients if websocket in self.binary]
+        json_frame = binary_frame = None
+        if len(binary) < len(recipients):
+            json_frame = self.encode(protocol.graph_json(ticker, points))
+        if binary:
+            if ticker not in self.ticker_ids:
+                self.ticker_ids.get(ticker)
+                schema = self.encode(protocol.schema(self.ticker_ids))
+                # Frames for the new id are useless to a client that missed it
+                self._broadcast(list(self.binary), None, schema, force=True)
+            binary_frame = protocol.encode_graph(self.ticker_ids.get(ticker), points)
+        self._broadcast(recipients, json_frame, binary_frame)
+
+    def _broadcast(
+        self,
+        recipients: list[WebSocket],
+        json_frame: str | None,
+        binary_frame: str | bytes | None,
+        key: Hashable | None = None,
+        force: bool = False,
+    ):
+        for websocket in recipients:
+            connection = self.active_connections.get(websocket)
+            if connection is None:
+                continue
+            writer = connection[1]
+            frame = binary_frame if websocket in self.binary else json_frame
+            if frame is None or writer.push(frame, key, force):
+                continue
+            if writer.slow:
+                # 1013: try again later
+                self.slow_disconnects += 1
+                self.remove_connection(websocket, 1013)
+            else:
+                self.remove_connection(websocket)
+
+    def metrics(self) -> dict[str, int]:
+        writers = [writer.metrics() for _, writer in self.active_connections.values()]
+        return {
+            "connections": len(writers),
+            "binary_connections": len(self.binary),
+            "topics": len(self.topics),
+            "pending": sum(w["pending"] for w in writers),
+            "dropped": sum(w["dropped"] for w in writers),
+            "conflated": sum(w["conflated"] for w in writers),
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+
+class GraphConflator:
+    """Merges each ticker's `update_graph` messages into one frame per interval.
+
+    Points that arrive within `interval` seconds are sent together (see
+    `SyncConnectionManager.broadcast_graph`). A frame keeps at most
+    `max_points`, dropping the oldest, so the latest state of every ticker is
+    always delivered.
+    """
+
+    def __init__(self, interval: float = 0.25, max_points: int = 500) -> None:
+        self.interval = interval
+        self.max_points = max_points
+        self.pending: dict[str, deque[protocol.Point]] = {}
+        self.points = 0
+        self.frames = 0
+
+    def add(self, message: dict) -> None:
+        points = self.pending.get(message["ticker"])
+        if points is None:
+            points = self.pending[message["ticker"]] = deque(maxlen=self.max_points)
+        points.append((message["timestamp"], message["price"], message["state"]))
+        self.points += 1
+
+    def flush(self) -> list[tuple[str, list[protocol.Point]]]:
+        pending, self.pending = self.pending, {}
+        self.frames += len(pending)
+        return [(ticker, list(points)) for ticker, points in pending.items()]
+
+    async def run(self, manager: SyncConnectionManager) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            for ticker, points in self.flush():
+                await manager.broadcast_graph(ticker, points)
 
-    async def broadcast_json(self, _dict: dict):
-        for connection in self.active_connections.values():
-            await connection.send_json(_dict)
+    def metrics(self) -> dict[str, int]:
+        return {"points": self.points, "frames": self.frames}
 
 
 sync_socket = SyncConnectionManager()
+graph_conflator = GraphConflator(GRAPH_INTERVAL)
 _sync_queue = Queue()
+sync_bridge = QueueBridge(_sync_queue)
+engine = TradingEngine(_sync_queue)
+history_cache = HistoryCache()
+bar_builder = BarBuilder()
+trade_statistics = TradeStatistics()
 
 
 async def start_day():
-    trade_node = session.query(TradeNode).filter_by(ticker="AAPL").first()
-    trade_node.active = True
-    session.commit()
-
-    process = Process(target=trade_node.start, args=(_sync_queue,))
-    try:
-        print(f"Starting process {process}")
-        process.start()
-    except KeyboardInterrupt:
-        process.kill()
-
+    async with orm.async_session() as db_session:
+        trade_node = await db_session.scalar(
+            select(TradeNode).filter_by(ticker="AAPL")
+        )
+        trade_node.active = True
+        settings = (await db_session.scalar(select(Settings))).snapshot()
+        await db_session.commit()
 
-async def _start_day():
-    print("Starting Jellyfish!")
-    budget = 1000
+    engine.start([trade_node.ticker], settings)
 
-    trade_node_budget = (
-        budget * (session.query(Settings).first().allocation_of_funds / 100) / 10
-    )
 
-    potential_gainers = pd.read_html("https://finance.yahoo.com/gainers")[0]
-    gainers: list[TradeNode] = []
+def _movers(url: str, trade_node_budget: float) -> list[TradeNode]:
+    movers: list[TradeNode] = []
 
-    for _, gainer in potential_gainers.iterrows():
-        price = gainer["Price (Intraday)"]
-        ticker = gainer["Symbol"]
+    for _, mover in pd.read_html(url)[0].iterrows():
+        price = mover["Price (Intraday)"]
+        ticker = mover["Symbol"]
 
         if price > trade_node_budget:
             continue
         if not Broker.is_available(ticker):
             continue
-        if len(gainers) == 5:
+        if len(movers) == 5:
             break
 
         print(ticker, price)
-        gainers.append(TradeNode(ticker=ticker, active=True))
-
-    potential_losers = pd.read_html("https://finance.yahoo.com/losers")[0]
-    losers: list[TradeNode] = []
+        movers.append(TradeNode(ticker=ticker, active=True))
+    return movers
 
-    for _, loser in potential_losers.iterrows():
-        price = loser["Price (Intraday)"]
-        ticker = loser["Symbol"]
 
-        if price > trade_node_budget:
-            continue
-        if not Broker.is_available(ticker):
-            continue
-        if len(losers) == 5:
-            break
+async def _start_day():
+    print("Starting Jellyfish!")
+    budget = 1000
 
-        print(ticker, price)
-        losers.append(TradeNode(ticker=ticker, active=True))
+    async with orm.async_session() as db_session:
+        settings = (await db_session.scalar(select(Settings))).snapshot()
+    trade_node_budget = budget * (settings.allocation_of_funds / 100) / 10
 
-    for gainer, loser in zip(gainers, losers):
-        existing_gainer = (
-            session.query(TradeNode).filter_by(ticker=gainer.ticker).first()
-        )
-        if not existing_gainer:
-            session.add(gainer)
-        else:
-            existing_gainer.active = True
-        gainer_process = Process(target=gainer.start)
-        try:
-            gainer_process.start()
-        except KeyboardInterrupt:
-            gainer_process.kill()
+    # Scraping and the broker checks block
+    gainers = await asyncio.to_thread(
+        _movers, "https://finance.yahoo.com/gainers", trade_node_budget
+    )
+    losers = await asyncio.to_thread(
+        _movers, "https://finance.yahoo.com/losers", trade_node_budget
+    )
 
-        existing_loser = session.query(TradeNode).filter_by(ticker=loser.ticker).first()
-        if not existing_loser:
-            session.add(loser)
-        else:
-            existing_loser.active = True
+    async with orm.async_session() as db_session:
+        for trade_node in [*gainers, *losers]:
+            existing = await db_session.scalar(
+                select(TradeNode).filter_by(ticker=trade_node.ticker)
+            )
+            if not existing:
+                db_session.add(trade_node)
+            else:
+                existing.active = True
+        await db_session.commit()
 
-        loser_process = Process(target=loser.start)
-        try:
-            loser_process.start()
-        except KeyboardInterrupt:
-            loser_process.kill()
-    session.commit()
+    engine.start([trade_node.ticker for trade_node in [*gainers, *losers]], settings)
 
 
 async def end_day():
     print("Stopping Jellyfish!")
-    for trade_node in session.query(TradeNode).filter_by(active=True).all():
-        await trade_node.stop()
-        trade_node.active = False
-    session.commit()
+    await asyncio.to_thread(engine.stop)
+    async with orm.async_session() as db_session:
+        trade_nodes = await db_session.scalars(select(TradeNode).filter_by(active=True))
+        for trade_node in trade_nodes.all():
+            await trade_node.stop()
+            trade_node.active = False
+        await db_session.commit()
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
+    # New columns and indexes, trade nodes write the Trades.side column
+    await asyncio.to_thread(orm.migrate)
+    await asyncio.to_thread(trade_statistics.load)
+    sync_bridge.start()
+    forwarder = asyncio.create_task(forward_trade_updates())
+    conflator = asyncio.create_task(graph_conflator.run(sync_socket))
     await start_day()
     yield
+    forwarder.cancel()
+    conflator.cancel()
     await end_day()
+    # Trade nodes only exit once everything they queued has been read
+    await asyncio.to_thread(sync_bridge.stop)
 
 
 app = FastAPI(lifespan=lifespan)
-req_session = requests_cache.CachedSession("dev")
+req_session = requests_cache.CachedSession(DATABASE)
+
 
-STATES = ["analyzing", "bought", "shorting", "noop"]
+def exchange_rates() -> dict[str, dict]:
+    """Currencies for the dashboard's selector, empty while the service is down."""
+    url = "https://data.kurzy.cz/json/meny/b.json"
+    try:
+        return req_session.get(url).json()["kurzy"]
+    except requests.RequestException:
+        return {}
 
 # Routes
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Session token -> user, so authenticated requests skip the database
+user_cache = TTLCache(maxsize=1024, ttl=300)
+
 
-def get_user(request: Request | WebSocket) -> Result[User, RedirectResponse]:
+async def get_user(request: Request | WebSocket) -> Result[User, RedirectResponse]:
     session_token = request.cookies.get("session")
     if not session_token:
         return Err(RedirectResponse(status_code=302, url="/"))
 
-    user = session.query(User).filter_by(session=session_token).first()
+    user = user_cache.get(session_token)
+    if user is not None:
+        return Ok(user)
+
+    async with orm.async_session() as db_session:
+        user = await db_session.scalar(
+            select(User)
+            .options(selectinload(User.config))
+            .filter_by(session=session_token)
+        )
     if user is None:
         return Err(RedirectResponse(status_code=302, url="/"))
 
+    user_cache.put(session_token, user)
     return Ok(user)
 
 
@@ -166,7 +367,7 @@ class LoginPage(Component):
 
 @app.get("/")
 async def index(request: Request):
-    user_result = get_user(request)
+    user_result = await get_user(request)
     if is_ok(user_result):
         return RedirectResponse(status_code=302, url="/dashboard")
 
@@ -177,13 +378,14 @@ async def index(request: Request):
 async def login(request: Request):
     form_data = await request.form()
     username, password = form_data["username"], form_data["password"]
-    user = (
-        session.query(User)
-        .filter_by(username=username, password=sha512(password))
-        .first()
-    )
+    async with orm.async_session() as db_session:
+        user = await db_session.scalar(
+            select(User).filter_by(username=username, password=sha512(password))
+        )
+        if user is None:
+            return RedirectResponse(status_code=302, url="/")
 
-    if user is not None:
+        user_cache.pop(user.session)
         token = sha512(
             str(random.randint(0, 100000))
             + user.username
@@ -191,20 +393,20 @@ async def login(request: Request):
         )
 
         user.session = token
-        session.commit()
+        await db_session.commit()
 
-        response = RedirectResponse(status_code=302, url="/dashboard")
-        response.set_cookie(key="session", value=token, httponly=False)
+    response = RedirectResponse(status_code=302, url="/dashboard")
+    response.set_cookie(key="session", value=token, httponly=False)
 
-        return response
-    else:
-        return RedirectResponse(status_code=302, url="/")
+    return response
 
 
 from typing import Any, List, Dict, Literal
 
 
 class Dashboard(Component):
+    streaming = True
+
     trade_nodes: List[TradeNode]
     broker: Dict[str, str]
     currencies: Dict[str, Any]
@@ -216,16 +418,16 @@ class Dashboard(Component):
 @app.get("/dashboard")
 async def dashboard(request: Request):
     # This would work so well as a macro! I am starting to get Elixir.
-    user_result = get_user(request)
+    user_result = await get_user(request)
     if is_err(user_result):
         return user_result.err_value
     user: User = user_result.ok_value
 
-    trade_nodes = session.query(TradeNode).all()
-    currencies = req_session.get("https://data.kurzy.cz/json/meny/b.json").json()[
-        "kurzy"
-    ]
-    currencies[user.config.currency]["selected"] = True
+    async with orm.async_session() as db_session:
+        trade_nodes = (await db_session.scalars(select(TradeNode))).all()
+    # requests_cache reads SQLite and may go to the network
+    currencies = await asyncio.to_thread(exchange_rates)
+    currencies.setdefault(user.config.currency, {})["selected"] = True
     broker = {
         "name": Broker.name,
         "working_hours": Broker.working_hours,
@@ -249,13 +451,17 @@ async def dashboard(request: Request):
 
 @app.post("/logout")
 async def logout(request: Request):
-    user_result = get_user(request)
+    user_result = await get_user(request)
     if is_err(user_result):
         return user_result.err_value
     user: User = user_result.ok_value
 
-    user.session = ""
-    session.commit()
+    async with orm.async_session() as db_session:
+        await db_session.execute(
+            update(User).filter_by(id=user.id).values(session="")
+        )
+        await db_session.commit()
+    user_cache.pop(user.session)
 
     response = RedirectResponse(status_code=302, url="/")
     response.delete_cookie("session")
@@ -264,14 +470,18 @@ async def logout(request: Request):
 
 @app.post("/change_currency")
 async def change_currency(request: Request):
-    user_result = get_user(request)
+    user_result = await get_user(request)
     if is_err(user_result):
         return user_result.err_value
     user: User = user_result.ok_value
 
     currency = (await request.form()).get("currency")
-    user.config.currency = currency
-    session.commit()
+    async with orm.async_session() as db_session:
+        await db_session.execute(
+            update(Config).filter_by(user_id=user.id).values(currency=currency)
+        )
+        await db_session.commit()
+    user_cache.pop(user.session)
     return RedirectResponse(status_code=302, url="/dashboard")
 
 
@@ -287,7 +497,7 @@ async def healthcheck() -> dict:
 
 @app.get("/healthcheck")
 async def healthcheck_wrapper(request: Request):
-    user_result = get_user(request)
+    user_result = await get_user(request)
     if is_err(user_result):
         return user_result.err_value
     _user: User = user_result.ok_value
@@ -295,7 +505,28 @@ async def healthcheck_wrapper(request: Request):
     return JSONResponse(await healthcheck())
 
 
+@app.get("/metrics")
+async def metrics(request: Request):
+    user_result = await get_user(request)
+    if is_err(user_result):
+        return user_result.err_value
+
+    return JSONResponse(
+        {
+            "user_cache": user_cache.metrics(),
+            "templates": template_cache.metrics(),
+            "fragments": fragment_cache.metrics(),
+            "sync_queue": sync_bridge.metrics(),
+            "sync_socket": sync_socket.metrics(),
+            "update_graph": graph_conflator.metrics(),
+            "history": history_cache.metrics(),
+        }
+    )
+
+
 class Statistics(Component):
+    cache_fragments = True
+
     statistics: List[Dict[str, str | int]]
     ticker: str
 
@@ -305,73 +536,26 @@ class Statistics(Component):
 class Ticker(Component):
     statistics: str
     ticker: str
+    resolutions: List[str]
 
     template: Template = Template("templates/ticker.jinja")
 
 
 @app.get("/view/{ticker}")
 async def view(ticker: str, request: Request):
-    user_result = get_user(request)
+    user_result = await get_user(request)
     if is_err(user_result):
         return user_result.err_value
-    statistics = [
-        {
-            "name": "Aktuální",
-            "id": "now",
-            "number_of_trades": 27,
-            "expenditure": "1000 CZK",
-            "revenue": "10000 CZK",
-            "fee": "10 CZK",
-            "profit": "8990 CZK",
-            "profit_factor": 1,
-        },
-        {
-            "name": "Denní",
-            "id": "daily",
-            "number_of_trades": 27,
-            "expenditure": "1000 CZK",
-            "revenue": "10000 CZK",
-            "fee": "10 CZK",
-            "profit": "8990 CZK",
-            "profit_factor": 1,
-        },
-        {
-            "name": "Týdenní",
-            "id": "weekly",
-            "number_of_trades": 27,
-            "expenditure": "1000 CZK",
-            "revenue": "10000 CZK",
-            "fee": "10 CZK",
-            "profit": "8990 CZK",
-            "profit_factor": 1,
-        },
-        {
-            "name": "Měsíční",
-            "id": "monthly",
-            "number_of_trades": 27,
-            "expenditure": "1000 CZK",
-            "revenue": "10000 CZK",
-            "fee": "10 CZK",
-            "profit": "8990 CZK",
-            "profit_factor": 1,
-        },
-        {
-            "name": "Roční",
-            "id": "yearly",
-            "number_of_trades": 27,
-            "expenditure": "1000 CZK",
-            "revenue": "10000 CZK",
-            "fee": "10 CZK",
-            "profit": "8990 CZK",
-            "profit_factor": 1,
-        },
-    ]
-
+    currency = user_result.ok_value.config.currency
     if ticker == "statistics":
-        return Statistics(statistics=statistics, ticker="global").html()
+        statistics = trade_statistics.view(GLOBAL, currency)
+        return Statistics(statistics=statistics, ticker=GLOBAL).html()
     else:
+        statistics = trade_statistics.view(ticker, currency)
         statistics = Statistics(statistics=statistics, ticker=ticker).raw()
-        return Ticker(ticker=ticker, statistics=statistics).html()
+        return Ticker(
+            ticker=ticker, statistics=statistics, resolutions=list(RESOLUTIONS)
+        ).html()
 
 
 class SettingsComponent(Component):
@@ -384,88 +568,176 @@ class SettingsComponent(Component):
 
 @app.get("/settings")
 async def get_settings():
-    settings = session.query(Settings).first()
+    async with orm.async_session() as db_session:
+        settings = await db_session.scalar(select(Settings))
     return SettingsComponent(**vars(settings)).html()
 
 
 @app.post("/settings")
 async def post_settings(request: Request):
     form_data = await request.form()
-    settings = session.query(Settings).first()
-    settings.allocation_of_funds = form_data["allocation_of_funds"]
-    settings.groups = form_data["groups"]
-    settings.prices_in_groups = form_data["prices_in_groups"]
-    settings.compliance = form_data["compliance"]
-    session.commit()
+    async with orm.async_session() as db_session:
+        settings = await db_session.scalar(select(Settings))
+        settings.allocation_of_funds = form_data["allocation_of_funds"]
+        settings.groups = form_data["groups"]
+        settings.prices_in_groups = form_data["prices_in_groups"]
+        settings.compliance = form_data["compliance"]
+        await db_session.commit()
+    engine.publish(settings.snapshot())
 
     return RedirectResponse("/dashboard", 302)
 
 
 class SyncHandler:
     @staticmethod
-    def graph_sync(_user: User, req: dict) -> list[dict]:
-        stock_data = yfinance.Ticker(req["ticker"]).history(period=req["sync_time"])
+    async def graph_sync(_user: User, req: dict, _websocket: WebSocket) -> list[dict]:
+        max_points = point_budget(req.get("max_points"))
+        history = await history_cache.get(req["ticker"], req["sync_time"], max_points)
 
-        timestamps = pd.to_datetime(stock_data.index)
-        prices = stock_data["Close"]
+        timestamps = pd.to_datetime(history.index)
 
         response = [
             {
                 "timestamp": timestamp.strftime("%H:%M:%S"),
                 "price": price,
-                "state": STATES[random.randint(0, len(STATES) - 1)],
+                "state": state,
             }
-            for timestamp, price in zip(timestamps, prices)
+            for timestamp, price, state in zip(
+                timestamps, history["price"], history["state"]
+            )
         ]
         return response
 
     @staticmethod
-    def stop_trading(_user: User, _req: dict) -> dict[Literal["result"], str]:
+    def stop_trading(
+        _user: User, _req: dict, _websocket: WebSocket
+    ) -> dict[Literal["result"], str]:
         return {"result": "ok"}
 
     @staticmethod
-    def start_trading(_user: User, _req: dict) -> dict[Literal["result"], str]:
+    def start_trading(
+        _user: User, _req: dict, _websocket: WebSocket
+    ) -> dict[Literal["result"], str]:
+        return {"result": "ok"}
+
+    @staticmethod
+    def bars(_user: User, req: dict, _websocket: WebSocket) -> list[dict] | dict:
+        if req.get("resolution") not in RESOLUTIONS:
+            return {"result": "error"}
+        count = req.get("count", 100)
+        if not isinstance(count, int):
+            count = 100
+        return [
+            asdict(bar)
+            for bar in bar_builder.bars(req.get("ticker"), req["resolution"], count)
+        ]
+
+    @staticmethod
+    def subscribe(
+        _user: User, req: dict, websocket: WebSocket
+    ) -> dict[Literal["result"], str]:
+        topic = req.get("topic")
+        if not isinstance(topic, str):
+            return {"result": "error"}
+        sync_socket.subscribe(websocket, topic)
+        return {"result": "ok"}
+
+    @staticmethod
+    def unsubscribe(
+        _user: User, req: dict, websocket: WebSocket
+    ) -> dict[Literal["result"], str]:
+        topic = req.get("topic")
+        if not isinstance(topic, str):
+            return {"result": "error"}
+        sync_socket.unsubscribe(websocket, topic)
         return {"result": "ok"}
 
 
 @app.websocket("/sync")
 async def sync(websocket: WebSocket):
-    user_result = get_user(websocket)
+    user_result = await get_user(websocket)
 
-    if is_ok(user_result):
-        await websocket.accept()
-    else:
+    if is_err(user_result):
         return 1
     user: User = user_result.ok_value
 
-    sync_socket.add_connection(user, websocket)
+    offered = websocket.scope.get("subprotocols", [])
+    subprotocol = next((p for p in offered if p in protocol.SUBPROTOCOLS), None)
+    await websocket.accept(subprotocol)
+    sync_socket.add_connection(user, websocket, subprotocol)
     try:
         while True:
             request: dict = await websocket.receive_json()
             action = request.get("action", "no_action")
             if hasattr(SyncHandler, action):
-                await websocket.send_json(
-                    {
-                        "action": action,
-                        "data": getattr(SyncHandler, request["action"])(user, request),
-                    }
-                )
+                data = getattr(SyncHandler, action)(user, request, websocket)
+                if inspect.isawaitable(data):
+                    data = await data
+                await sync_socket.send_json({"action": action, "data": data}, websocket)
             else:
-                await websocket.send_json({"error": "No such action"})
+                await sync_socket.send_json({"error": "No such action"}, websocket)
     except:
-        sync_socket.remove_connection(user)
+        sync_socket.remove_connection(websocket)
+
+
+async def publish_bars(message: dict):
+    ticker = message["ticker"]
+    closed = bar_builder.update(ticker, message["timestamp"], message["price"])
+    for resolution, bar in closed:
+        await sync_socket.broadcast_json(
+            {
+                "action": "bar",
+                "ticker": ticker,
+                "resolution": resolution,
+                "bar": asdict(bar),
+            },
+            topic=ticker,
+        )
+
+
+async def publish_statistics(ticker: str):
+    # Rendered statistics views are out of date now
+    Statistics.invalidate_all()
+    for topic in (ticker, GLOBAL):
+        # Every subscriber sees the amounts in the currency of their settings
+        currencies = {user.config.currency for user in sync_socket.users(topic)}
+        for window in WINDOWS:
+            totals = trade_statistics.window(topic, window)
+            for currency in currencies:
+                await sync_socket.broadcast_json(
+                    {
+                        "action": "update_statistics",
+                        "ticker": topic,
+                        "stat_id": window,
+                        "values": totals.display(currency),
+                    },
+                    key=("update_statistics", topic, window),
+                    topic=topic,
+                    where=lambda user: user.config.currency == currency,
+                )
+
+
+async def forward_trade_updates():
+    async for batch in sync_bridge:
+        for message in batch:
+            if message.get("action") == "update_graph":
+                graph_conflator.add(message)
+                await publish_bars(message)
+                continue
+            if message.get("action") == "trade":
+                trade_statistics.apply(message)
+                await publish_statistics(message["ticker"])
+                continue
+            try:
+                await sync_socket.broadcast_json(message, topic=message.get("ticker"))
+            except Exception:
+                pass
 
 
 async def sync_test():
     def get_random(_list: list):
         return _list[random.randint(0, len(_list) - 1)]
 
-    tickers = [
-        trade_node.ticker
-        for trade_node in session.query(TradeNode).all()
-        if trade_node.active
-    ]
-    tickers.append("global")
     status_bar_keys = [
         "balance",
         "equity",
@@ -474,37 +746,16 @@ async def sync_test():
         "level",
     ]
     while True:
-        if not _sync_queue.empty():
-            value = _sync_queue.get()
-            await sync_socket.broadcast_json(value)
         try:
             # Sending new status bar data
+            key = get_random(status_bar_keys)
             await sync_socket.broadcast_json(
                 {
                     "action": "update_status_bar",
-                    "key": get_random(status_bar_keys),
+                    "key": key,
                     "value": str(random.randint(0, 1000)) + "$",
-                }
-            )
-            ids = ["now", "daily", "weekly", "monthly", "yearly"]
-            keys = [
-                "number_of_trades",
-                "expenditure",
-                "revenue",
-                "fee",
-                "profit",
-                "profit_factor",
-            ]
-
-            # Sending new statistic data
-            await sync_socket.broadcast_json(
-                {
-                    "action": "update_statistics",
-                    "ticker": get_random(tickers),
-                    "stat_id": get_random(ids),
-                    "key": get_random(keys),
-                    "value": random.randint(0, 1000),
-                }
+                },
+                key=("update_status_bar", key),
             )
         except:
             pass
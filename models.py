@@ -1,15 +1,29 @@
 import asyncio
 import random
+import time
+from dataclasses import asdict
 from datetime import datetime
 from multiprocessing import Queue
+from queue import Empty
 from typing import Iterator, Literal
 
-from sqlalchemy import Column, Float, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    String,
+    Boolean,
+    ForeignKey,
+    DateTime,
+    Index,
+)
 from sqlalchemy.orm import relationship
 
-from db import orm, session
-from trading import Brokerage
-from trading import TradeState, AnalysisResult
+from bars import BarBuilder
+from db import orm
+from protocol import STATE_CODES
+from tickstore import tick_store
+from trading import Brokerage, Position, SettingsSnapshot, Strategy, TradeState
 
 
 class User(orm.Base):
@@ -28,319 +42,103 @@ class User(orm.Base):
         return "<User(id='%s', username='%s')>" % (self.id, self.username)
 
 
-class BiggerThan: ...
-
-
-class SmallerThan: ...
-
-
-class Equals: ...
-
-
 class TradeNode(orm.Base):
     __tablename__ = "TradeNodes"
     ticker = Column(String, primary_key=True, nullable=False, unique=True)
     active = Column(Boolean, nullable=False)
-    trades = relationship("Trade", backref="trade_node")
+    # Never loaded as a whole, open positions are kept by persistence.PositionBook
+    trades = relationship("Trade", backref="trade_node", lazy="dynamic")
 
     def __init__(self, ticker: str, active: bool = False):
         self.state = TradeState.DEFAULT
         self.ticker = ticker
         self.active = active
-    @staticmethod
-    def _analyze(groups: list[list[float]]) -> AnalysisResult:
-        comparison_results = []
-        for group in groups:
-            comparison_results.append(
-                [
-                    (
-                        BiggerThan
-                        if group[i] > group[i - 1]
-                        else SmallerThan if group[i] < group[i - 1] else Equals
-                    )
-                    for i in range(1, len(group))
-                ]
-            )
-
-        res = []
-        for group in comparison_results:
-            up_occurrences = len([e for e in group if e == BiggerThan])
-            down_occurrences = len([e for e in group if e == SmallerThan])
-
-            if up_occurrences >= session.query(Settings).first().compliance:
-                res.append(BiggerThan)
-            elif down_occurrences >= session.query(Settings).first().compliance:
-                res.append(SmallerThan)
-            else:
-                res.append(Equals)
-
-        for group in res:
-            if not group == BiggerThan:
-                break
-        else:
-            return AnalysisResult.GOING_UP
-
-        for group in res:
-            if not group == SmallerThan:
-                break
-        else:
-            return AnalysisResult.GOING_DOWN
 
-        return AnalysisResult.INSUFFICIENT
-
-    def start(self, sync_queue: Queue) -> Brokerage:
-        return asyncio.run(self.trade(sync_queue))
+    def _receive_settings(self, settings_queue: Queue) -> None:
+        # Settings are pushed by the server whenever they change
+        try:
+            while True:
+                self.strategy.update_settings(settings_queue.get_nowait())
+        except Empty:
+            pass
 
     @staticmethod
     def price_feed() -> Iterator[dict[Literal["price"], float]]:
         while True:
             yield {"price": random.random() * 100}
 
-    async def trade(self, sync_queue: Queue) -> Brokerage:
-        trade_node = session.query(TradeNode).filter_by(ticker=self.ticker).first()
-        self.state = TradeState.DEFAULT
+    async def trade(
+        self,
+        sync_queue: Queue,
+        settings: SettingsSnapshot,
+        settings_queue: Queue,
+        bars: BarBuilder | None = None,
+    ) -> Brokerage:
+        from persistence import PositionBook, trade_writer
+
+        if bars is None:
+            bars = BarBuilder()
+        self.strategy = Strategy(settings, ticker=self.ticker, bars=bars)
+        self.book = await asyncio.to_thread(PositionBook.load, self.ticker)
+        # Only one position can be carried on, older ones are closed at the
+        # first price
+        stale = self.book.positions[:-1]
+        if self.book.position is not None and not self.strategy.resume(
+            self.book.position
+        ):
+            stale = list(self.book.positions)
 
-        brokerage = Brokerage(1000)
-        group = []
-        groups: list[list[float]] = []
-        last_price = None
         price = None
-        for i, price in enumerate(datapoint["price"] for datapoint in self.price_feed()):
-            print(price)
+        for price in (datapoint["price"] for datapoint in self.price_feed()):
+            # Let the other trade nodes on this event loop take their turn
+            await asyncio.sleep(0)
             if not self.active:
                 break
-
-            if i == 0:
-                last_price = price
-                continue
-
-            try:
-                last_trade: Trade | None = trade_node.trades[-1]
-            except IndexError:
-                last_trade = None
-            if last_trade is not None and not last_trade.closing_price:
-                if self.state == TradeState.BOUGHT:
-                    if price < last_trade.opening_price:
-                        brokerage.sell(price)
-                        last_trade.closed = datetime.now()
-                        last_trade.closing_price = price
-                        session.commit()
-                        self.state = TradeState.DEFAULT
-
-                elif self.state == TradeState.SHORTING:
-                    if price > last_trade.opening_price:
-                        brokerage.end_short(price)
-                        last_trade.closed = datetime.now()
-                        last_trade.closing_price = price
-                        session.commit()
-                        self.state = TradeState.DEFAULT
-
-            if self.state == TradeState.BOUGHT:
-                if last_price > price:
-                    brokerage.sell(price)
-                    last_trade.closed = datetime.now()
-                    last_trade.closing_price = price
-                    session.commit()
-                    self.state = TradeState.DEFAULT
-
-            elif self.state == TradeState.SHORTING:
-                if last_price < price:
-                    brokerage.end_short(price)
-                    last_trade.closed = datetime.now()
-                    last_trade.closing_price = price
-                    session.commit()
-                    self.state = TradeState.DEFAULT
-
-            # Accumulating the values
-            if len(group) == session.query(Settings).first().prices_in_groups:
-                groups.append(group)
-                group = []
-            else:
-                group.append(price)
-                sync_queue.put(
-                    {
-                        "action": "update_graph",
-                        "ticker": self.ticker,
-                        "timestamp": datetime.now().strftime("%H:%M:%S"),
-                        "price": price,
-                        "state": self.state,
-                    }
-                )
-                last_price = price
-                continue
-            if not (len(groups) == session.query(Settings).first().groups):
-                group.append(price)
-                sync_queue.put(
-                    {
-                        "action": "update_graph",
-                        "ticker": self.ticker,
-                        "timestamp": datetime.now().strftime("%H:%M:%S"),
-                        "price": price,
-                        "state": self.state,
-                    }
-                )
-                last_price = price
+            self._receive_settings(settings_queue)
+
+            for position in stale:
+                position.closing_price = price
+                position.closed = datetime.now()
+                self.book.close(position)
+                self._publish_trade(sync_queue, position)
+            stale = []
+
+            timestamp = time.time()
+            bars.update(self.ticker, timestamp, price)
+            decision = self.strategy.on_price(price)
+            state = self.strategy.state if decision is None else decision.state
+            tick_store.append(self.ticker, timestamp, price, STATE_CODES[state.value])
+            if decision is None:
                 continue
 
-            analysis_result = self._analyze(groups)
-
-            group.clear()
-            groups.clear()
-            budget = 1000
-            budget = (
-                budget
-                * (session.query(Settings).first().allocation_of_funds / 100)
-                / 10
+            if decision.closed is not None:
+                self.book.close(decision.closed)
+                self._publish_trade(sync_queue, decision.closed)
+            if decision.opened is not None:
+                self.book.open(decision.opened)
+                self._publish_trade(sync_queue, decision.opened)
+
+            sync_queue.put(
+                {
+                    "action": "update_graph",
+                    "ticker": self.ticker,
+                    "timestamp": timestamp,
+                    "price": price,
+                    "state": decision.state.value,
+                    "sent_at": time.time(),
+                }
             )
-            amount = budget / price
-
-            if self.state == TradeState.BOUGHT:
-                if analysis_result == AnalysisResult.GOING_UP:
-                    # Send "bought" to frontend
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "bought",
-                        }
-                    )
-
-                elif analysis_result == AnalysisResult.GOING_DOWN:
-                    # Send "analyzing" to frontend
-                    brokerage.sell(price)
-                    last_trade.closed = datetime.now()
-                    last_trade.closing_price = price
-                    session.commit()
-
-                    self.state = TradeState.DEFAULT
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "bought",
-                        }
-                    )
-
-                elif analysis_result == AnalysisResult.INSUFFICIENT:
-                    # Send "bought" to frontend
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "bought",
-                        }
-                    )
-
-            elif self.state == TradeState.DEFAULT:
-                if analysis_result == AnalysisResult.GOING_UP:
-                    # Send "bought" to frontend
-                    brokerage.buy(price, amount)
-                    trade_node.trades.append(
-                        Trade(amount=amount, opening_price=price, opened=datetime.now())
-                    )
-                    session.commit()
-
-                    self.state = TradeState.BOUGHT
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "bought",
-                        }
-                    )
-
-                elif analysis_result == AnalysisResult.GOING_DOWN:
-                    # Send "shorting" to frontend
-                    brokerage.short(price, amount)
-
-                    trade_node.trades.append(
-                        Trade(amount=amount, opening_price=price, opened=datetime.now())
-                    )
-                    session.commit()
-
-                    self.state = TradeState.SHORTING
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "shorting",
-                        }
-                    )
-
-                elif analysis_result == AnalysisResult.INSUFFICIENT:
-                    # Send "analyzing" to frontend
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "analyzing",
-                        }
-                    )
-
-            elif self.state == TradeState.SHORTING:
-                if analysis_result == AnalysisResult.GOING_UP:
-                    # Send "analyzing" to frontend
-                    brokerage.end_short(price)
-
-                    last_trade.closed = datetime.now()
-                    last_trade.closing_price = price
-                    session.commit()
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "shorting",
-                        }
-                    )
-
-                elif analysis_result == AnalysisResult.GOING_DOWN:
-                    # Send "shorting" to frontend
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "shorting",
-                        }
-                    )
-
-                elif analysis_result == AnalysisResult.INSUFFICIENT:
-                    # Send "shorting" to frontend
-
-                    sync_queue.put(
-                        {
-                            "action": "update_graph",
-                            "ticker": self.ticker,
-                            "timestamp": datetime.now().strftime("%H:%M:%S"),
-                            "price": price,
-                            "state": "shorting",
-                        }
-                    )
-            last_price = price
-        brokerage.end_trading(price)
-        return brokerage
+        # Without a price the position stays open and is resumed next time
+        closed = self.strategy.end_trading(price) if price is not None else None
+        if closed is not None:
+            self.book.close(closed)
+            self._publish_trade(sync_queue, closed)
+        tick_store.flush(self.ticker)
+        await asyncio.to_thread(trade_writer.flush)
+        return self.strategy.brokerage
+
+    def _publish_trade(self, sync_queue: Queue, position: Position) -> None:
+        sync_queue.put({"action": "trade", "ticker": self.ticker, **asdict(position)})
 
     async def stop(self): ...
 
@@ -354,11 +152,27 @@ class Trade(orm.Base):
     closing_price = Column(Float)
     opened = Column(DateTime, default=datetime.now)
     closed = Column(DateTime)
+    # NULL in rows written before shorts were recorded, those were all buys
+    side = Column(String, default=TradeState.BOUGHT.value)
+
+    __table_args__ = (
+        # The open trades of all nodes, see tradestats.TradeStatistics.load
+        Index("ix_Trades_closed", "closed"),
+        # A node's open trades
+        Index("ix_Trades_trade_server_id_closed", "trade_server_id", "closed"),
+    )
 
-    def __init__(self, amount: int, opening_price: float, opened):
+    def __init__(
+        self,
+        amount: int,
+        opening_price: float,
+        opened,
+        side: str = TradeState.BOUGHT.value,
+    ):
         self.amount = amount
         self.opening_price = opening_price
         self.opened = opened
+        self.side = side
 
 
 class Config(orm.Base):
@@ -391,3 +205,12 @@ class Settings(orm.Base):
         self.groups = groups
         self.prices_in_groups = prices_in_groups
         self.compliance = compliance
+
+    def snapshot(self) -> SettingsSnapshot:
+        # Form posts leave the columns holding strings until they are reloaded
+        return SettingsSnapshot(
+            allocation_of_funds=int(self.allocation_of_funds),
+            groups=int(self.groups),
+            prices_in_groups=int(self.prices_in_groups),
+            compliance=int(self.compliance),
+        )
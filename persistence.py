@@ -0,0 +1,250 @@
+import atexit
+import os
+import time
+from enum import Enum
+from queue import Empty, SimpleQueue
+from threading import Event, Thread
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from db import orm
+from models import Trade
+from trading import Position, TradeState
+
+
+class Durability(str, Enum):
+    # Commit every trade change before the trade loop continues
+    SYNC = "sync"
+    # Queue trade changes and commit them in batches from a background thread
+    GROUP = "group"
+
+
+DURABILITY = Durability(os.environ.get("JELLYFISH_DURABILITY", Durability.GROUP))
+
+_OPEN = "open"
+_CLOSE = "close"
+_STOP = object()
+
+
+class TradeWriter:
+    """Write-behind persistence of `Trade` rows.
+
+    Opened and closed positions are queued without touching SQLite and
+    committed together once `batch_size` changes are waiting or
+    `flush_interval` seconds have passed since the first of them. A failed
+    batch is rolled back and written change by change; changes that hit a
+    locked database are retried with the next batch, up to `max_attempts`
+    times, and other failing changes are logged and dropped.
+    """
+
+    def __init__(
+        self,
+        durability: Durability = DURABILITY,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_attempts: int = 3,
+    ) -> None:
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._queue: SimpleQueue = SimpleQueue()
+        self._session = None
+        self._thread: Thread | None = None
+        # Rows of open positions, keyed by the position's id. Rows opened
+        # before a restart are known by their primary key only
+        self._trades: dict[int, tuple[Position, Trade | int]] = {}
+        # Changes that hit a locked database, with their failed attempts
+        self._retry: list[tuple[tuple, int]] = []
+
+    def open(self, ticker: str, position: Position) -> None:
+        self._submit((_OPEN, ticker, position))
+
+    def close(self, position: Position) -> None:
+        self._submit((_CLOSE, None, position))
+
+    def track(self, position: Position, trade_id: int) -> None:
+        """Let `close` update the existing row `trade_id` for `position`."""
+        self._trades[id(position)] = (position, trade_id)
+
+    def flush(self, timeout: float | None = 30.0) -> bool:
+        """Wait until everything submitted so far is written, False if that
+        took longer than `timeout` seconds."""
+        if self._thread is None:
+            return True
+
+        flushed = Event()
+        self._queue.put(flushed)
+        return flushed.wait(timeout)
+
+    def stop(self, timeout: float | None = 30.0) -> None:
+        if self._thread is None:
+            return
+
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        if self._retry:
+            print(f"Trade writer stopped with {len(self._retry)} unwritten changes")
+
+    def _submit(self, change: tuple) -> None:
+        if self.durability == Durability.SYNC:
+            self._write([change])
+            return
+
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="trade-writer", daemon=True)
+            self._thread.start()
+        self._queue.put(change)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except Empty:
+                    break
+
+            try:
+                self._write([change for change in batch if isinstance(change, tuple)])
+            finally:
+                for change in batch:
+                    if isinstance(change, Event):
+                        change.set()
+            if batch[-1] is _STOP:
+                return
+
+    def _write(self, changes: list[tuple]) -> None:
+        # Changes that failed on a locked database go first
+        retry, self._retry = self._retry, []
+        attempts = {id(change): attempt for change, attempt in retry}
+        changes = [change for change, _ in retry] + changes
+        if not changes:
+            return
+        if self._session is None:
+            self._session = orm.Session()
+
+        if self._commit(changes):
+            return
+        # Write the changes one by one so a bad one does not take the batch down
+        waiting = set()
+        for change in changes:
+            key = id(change[2])
+            if key in waiting:
+                # Keep the order of changes to a position that is retried
+                self._retry.append((change, attempts.get(id(change), 0)))
+                continue
+            try:
+                self._commit([change], reraise=True)
+            except OperationalError as error:
+                attempt = attempts.get(id(change), 0) + 1
+                if attempt < self.max_attempts:
+                    self._retry.append((change, attempt))
+                    waiting.add(key)
+                else:
+                    print(f"Dropping trade change {change[:2]}: {error}")
+            except Exception as error:
+                print(f"Dropping trade change {change[:2]}: {error!r}")
+
+    def _commit(self, changes: list[tuple], reraise: bool = False) -> bool:
+        # (key, entry) pairs to put back into `_trades` if the commit fails
+        undo = []
+        try:
+            for kind, ticker, position in changes:
+                key = id(position)
+                if kind == _OPEN:
+                    trade = Trade(
+                        amount=position.amount,
+                        opening_price=position.opening_price,
+                        opened=position.opened,
+                        side=position.side.value,
+                    )
+                    trade.trade_server_id = ticker
+                    self._session.add(trade)
+                    undo.append((key, self._trades.get(key)))
+                    self._trades[key] = (position, trade)
+                else:
+                    entry = self._trades.pop(key)
+                    undo.append((key, entry))
+                    _, trade = entry
+                    if isinstance(trade, int):
+                        trade = self._session.get(Trade, trade)
+                    trade.closing_price = position.closing_price
+                    trade.closed = position.closed
+            self._session.commit()
+            return True
+        except Exception:
+            self._session.rollback()
+            for key, entry in reversed(undo):
+                if entry is None:
+                    self._trades.pop(key, None)
+                else:
+                    self._trades[key] = entry
+            if reraise:
+                raise
+            return False
+
+
+# One writer per process, its thread is only started on first use
+trade_writer = TradeWriter()
+atexit.register(trade_writer.stop)
+
+
+class PositionBook:
+    """Open positions of one trade node, persisted through a `TradeWriter`.
+
+    `load` reads only the node's open `Trade` rows, so the trade history never
+    reaches the trade loop, and a restarted node finds the positions it left
+    open instead of abandoning their rows.
+    """
+
+    def __init__(self, ticker: str, writer: TradeWriter = trade_writer) -> None:
+        self.ticker = ticker
+        self.writer = writer
+        self.positions: list[Position] = []
+
+    @classmethod
+    def load(
+        cls, ticker: str, writer: TradeWriter = trade_writer
+    ) -> "PositionBook":
+        book = cls(ticker, writer)
+        with orm.Session() as db_session:
+            rows = db_session.execute(
+                select(
+                    Trade.id,
+                    Trade.side,
+                    Trade.amount,
+                    Trade.opening_price,
+                    Trade.opened,
+                )
+                .where(Trade.trade_server_id == ticker, Trade.closed.is_(None))
+                .order_by(Trade.opened)
+            ).all()
+
+        for trade_id, side, amount, opening_price, opened in rows:
+            # Rows from before the side column were all long positions
+            side = TradeState(side) if side else TradeState.BOUGHT
+            position = Position(side, amount, opening_price, opened)
+            writer.track(position, trade_id)
+            book.positions.append(position)
+        return book
+
+    @property
+    def position(self) -> Position | None:
+        """The most recently opened position."""
+        return self.positions[-1] if self.positions else None
+
+    def open(self, position: Position) -> None:
+        self.positions.append(position)
+        self.writer.open(self.ticker, position)
+
+    def close(self, position: Position) -> None:
+        # Positions compare by value, remove this very one
+        self.positions = [open_ for open_ in self.positions if open_ is not position]
+        self.writer.close(position)
@@ -0,0 +1,69 @@
+import struct
+from datetime import datetime
+
+from trading import TradeState
+
+# Offered by the browser in the websocket handshake, most preferred first
+BINARY = "jellyfish.binary"
+JSON = "jellyfish.json"
+SUBPROTOCOLS = (BINARY, JSON)
+
+# Graph states on the wire are indexes into this list
+STATES = [state.value for state in TradeState] + ["noop"]
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+# Binary frames, little endian:
+#   header  u8 frame type, u16 ticker id, u16 point count
+#   point   f64 epoch seconds, f64 price, u8 state code
+GRAPH_FRAME = 1
+HEADER = struct.Struct("<BHH")
+POINT = struct.Struct("<ddB")
+
+# (epoch seconds, price, state)
+Point = tuple[float, float, str]
+
+
+class TickerIds:
+    """Small integer ids for tickers, assigned on first use."""
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.ids
+
+    def get(self, ticker: str) -> int:
+        ticker_id = self.ids.get(ticker)
+        if ticker_id is None:
+            ticker_id = self.ids[ticker] = len(self.ids)
+        return ticker_id
+
+
+def schema(ticker_ids: TickerIds) -> dict:
+    """Everything a binary client needs to decode frames, sent as JSON."""
+    return {"action": "binary_schema", "states": STATES, "tickers": ticker_ids.ids}
+
+
+def encode_graph(ticker_id: int, points: list[Point]) -> bytes:
+    frame = bytearray(HEADER.size + POINT.size * len(points))
+    HEADER.pack_into(frame, 0, GRAPH_FRAME, ticker_id, len(points))
+    offset = HEADER.size
+    for timestamp, price, state in points:
+        POINT.pack_into(frame, offset, timestamp, price, STATE_CODES[state])
+        offset += POINT.size
+    return bytes(frame)
+
+
+def graph_json(ticker: str, points: list[Point]) -> dict:
+    return {
+        "action": "update_graph",
+        "ticker": ticker,
+        "points": [
+            {
+                "timestamp": datetime.fromtimestamp(timestamp).strftime("%H:%M:%S"),
+                "price": price,
+                "state": state,
+            }
+            for timestamp, price, state in points
+        ],
+    }
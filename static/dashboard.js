@@ -1,15 +1,36 @@
+// Binary frames of the jellyfish.binary subprotocol, see protocol.py
+const GRAPH_FRAME = 1
+const HEADER_SIZE = 5
+const POINT_SIZE = 17
+
 class SyncSocket {
     constructor(url) {
         this.connect = (url) => {
-            this.socket = new WebSocket(url)
+            this.socket = new WebSocket(url, ["jellyfish.binary", "jellyfish.json"])
+            this.socket.binaryType = "arraybuffer"
+            this.schema = { states: [], tickers: [] }
 
             this.socket.onopen = (_event) => {
                 console.log("Connected to the sync socket")
+                // The server forgets subscriptions when the socket closes
+                for (const topic of this.topics.keys()) {
+                    this.socket.send(JSON.stringify({ action: "subscribe", topic: topic }))
+                }
                 document.dispatchEvent(new Event("syncConnected"))
             }
 
             this.socket.onmessage = (event) => {
-                const dispatchEvent = new CustomEvent("sync_message", { detail: JSON.parse(event.data) })
+                let data
+                if (typeof event.data === "string") {
+                    data = JSON.parse(event.data)
+                    if (data.action === "binary_schema") {
+                        this.updateSchema(data)
+                    }
+                }
+                else {
+                    data = this.decode(event.data)
+                }
+                const dispatchEvent = new CustomEvent("sync_message", { detail: data })
                 document.dispatchEvent(dispatchEvent)
             }
 
@@ -25,9 +46,65 @@ class SyncSocket {
 
         }
         this.WS_URL = url
+        // topic -> number of elements showing it
+        this.topics = new Map()
         this.connect(this.WS_URL)
     }
 
+    updateSchema(schema) {
+        const tickers = []
+        for (const [ticker, id] of Object.entries(schema.tickers)) {
+            tickers[id] = ticker
+        }
+        this.schema = { states: schema.states, tickers: tickers }
+    }
+
+    // Turns a binary frame into the same message the JSON protocol sends
+    decode(buffer) {
+        const view = new DataView(buffer)
+        const frameType = view.getUint8(0)
+        if (frameType !== GRAPH_FRAME) {
+            console.error(`Unknown frame type ${frameType}`)
+            return {}
+        }
+
+        const count = view.getUint16(3, true)
+        const points = []
+        for (let offset = HEADER_SIZE; points.length < count; offset += POINT_SIZE) {
+            points.push({
+                timestamp: new Date(view.getFloat64(offset, true) * 1000).toTimeString().slice(0, 8),
+                price: view.getFloat64(offset + 8, true),
+                state: this.schema.states[view.getUint8(offset + 16)]
+            })
+        }
+        return {
+            action: "update_graph",
+            ticker: this.schema.tickers[view.getUint16(1, true)],
+            points: points
+        }
+    }
+
+    // Only messages for subscribed topics (tickers or "global") are sent to us
+    subscribe(topic) {
+        const count = this.topics.get(topic) || 0
+        this.topics.set(topic, count + 1)
+        if (count === 0 && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({ action: "subscribe", topic: topic }))
+        }
+    }
+
+    unsubscribe(topic) {
+        const count = this.topics.get(topic) || 0
+        if (count > 1) {
+            this.topics.set(topic, count - 1)
+            return
+        }
+        this.topics.delete(topic)
+        if (count === 1 && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({ action: "unsubscribe", topic: topic }))
+        }
+    }
+
     on(action, cb) {
         async function onHandler(event) {
             const data = event.detail
@@ -37,6 +114,11 @@ class SyncSocket {
             }
         }
         document.addEventListener("sync_message", onHandler)
+        return onHandler
+    }
+
+    off(handler) {
+        document.removeEventListener("sync_message", handler)
     }
 
     get(request) {
@@ -58,6 +140,20 @@ class SyncSocket {
 
 let syncSocket = new SyncSocket("ws://localhost:8000/sync")
 
+// Keeps the page subscribed to a topic while the element is in the document
+class SyncTopic extends HTMLElement {
+    connectedCallback() {
+        this.topic = this.getAttribute("topic")
+        syncSocket.subscribe(this.topic)
+    }
+
+    disconnectedCallback() {
+        syncSocket.unsubscribe(this.topic)
+    }
+}
+
+window.customElements.define("sync-topic", SyncTopic)
+
 async function healthcheck() {
     function markAsPassed(elementId) {
         const element = document.getElementById(elementId)
@@ -151,10 +247,24 @@ syncSocket.on("update_status_bar", async (data) => {
 })
 
 syncSocket.on("update_statistics", async (data) => {
-    const element = document.getElementById(`${data.ticker}_${data.stat_id}_${data.key}`)
-    try {
-        element.innerHTML = data.value
-        element.setAttribute("class", "bold_text")
-        setTimeout(() => { element.setAttribute("class", "") }, 400)
-    } catch { }
-})
\ No newline at end of file
+    // Either a single key and value or all values of a window
+    const values = data.values || { [data.key]: data.value }
+    for (const [key, value] of Object.entries(values)) {
+        const element = document.getElementById(`${data.ticker}_${data.stat_id}_${key}`)
+        try {
+            element.innerHTML = value
+            element.setAttribute("class", "bold_text")
+            setTimeout(() => { element.setAttribute("class", "") }, 400)
+        } catch { }
+    }
+})
+
+syncSocket.on("bar", async (data) => {
+    // The last closed bar of each resolution, see bars.py
+    const element = document.getElementById(`${data.ticker}_bar_${data.resolution}`)
+    if (!element) return
+    const bar = data.bar
+    const time = new Date(bar.start * 1000).toLocaleTimeString()
+    element.innerHTML = `${time} O ${bar.open.toFixed(2)} H ${bar.high.toFixed(2)} ` +
+        `L ${bar.low.toFixed(2)} C ${bar.close.toFixed(2)} (${bar.volume} ticků)`
+})
@@ -23,6 +23,7 @@ class Graph extends HTMLElement {
         this.graph = null
     }
     async connectedCallback() {
+        syncSocket.subscribe(this.ticker)
         this.innerHTML = `
         <div id="graph" class="chart-container border">
             <canvas id="priceGraph"></canvas>
@@ -38,7 +39,9 @@ class Graph extends HTMLElement {
         const data = (await syncSocket.get({
             action: "graph_sync",
             ticker: this.ticker,
-            sync_time: "7d"
+            sync_time: "7d",
+            // A low and a high point per pixel is all the chart can show
+            max_points: 2 * (this.clientWidth || 500)
         })).data
         this.chart = new Chart("priceGraph", {
             type: "line",
@@ -73,18 +76,28 @@ class Graph extends HTMLElement {
         })
 
 
-        syncSocket.on("update_graph", async (updateData) => {
+        // Points arrive batched per ticker, one repaint per frame
+        this.updateHandler = syncSocket.on("update_graph", async (updateData) => {
             if (updateData.ticker == this.ticker) {
-                data.push(updateData)
                 const dataset = this.chart.data.datasets[0]
-                dataset.data.push(updateData.price)
-                this.chart.data.labels.push(updateData.timestamp)
+                for (const point of updateData.points) {
+                    data.push(point)
+                    dataset.data.push(point.price)
+                    this.chart.data.labels.push(point.timestamp)
+                }
                 this.chart.update()
 
             }
 
         })
     }
+
+    disconnectedCallback() {
+        syncSocket.unsubscribe(this.ticker)
+        if (this.updateHandler) {
+            syncSocket.off(this.updateHandler)
+        }
+    }
 }
 
 window.customElements.define("price-graph", Graph)
\ No newline at end of file
@@ -0,0 +1,136 @@
+import argparse
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import load_prices, profit_factor, run
+from trading import SettingsSnapshot
+
+# Price series attached from shared memory, one list per worker process
+_series: list[np.ndarray] = []
+_segments: list[shared_memory.SharedMemory] = []
+
+
+def _attach(segments: list[tuple[str, int]]) -> None:
+    for name, length in segments:
+        segment = shared_memory.SharedMemory(name=name)
+        _segments.append(segment)
+        _series.append(np.ndarray((length,), dtype=np.float64, buffer=segment.buf))
+
+
+def _evaluate(settings: SettingsSnapshot) -> tuple[SettingsSnapshot, dict[str, float]]:
+    trades = 0
+    profit = gross_profit = gross_loss = 0.0
+    for prices in _series:
+        result = run(prices, settings)
+        trades += len(result.ledger)
+        profit += result.profit
+        gross_profit += result.gross_profit
+        gross_loss += result.gross_loss
+
+    return settings, {
+        "trades": trades,
+        "profit": profit,
+        "profit_factor": profit_factor(gross_profit, gross_loss),
+    }
+
+
+def candidates(
+    allocation_of_funds: list[int],
+    groups: list[int],
+    prices_in_groups: list[int],
+    compliance: list[int],
+    samples: int | None = None,
+    seed: int | None = None,
+) -> list[SettingsSnapshot]:
+    grid = [
+        SettingsSnapshot(*values)
+        for values in itertools.product(
+            allocation_of_funds, groups, prices_in_groups, compliance
+        )
+        # A group of n prices has n - 1 steps, more can never comply
+        if values[3] < values[2]
+    ]
+    if samples is not None and samples < len(grid):
+        return random.Random(seed).sample(grid, samples)
+    return grid
+
+
+def sweep(
+    series: list[np.ndarray],
+    settings: list[SettingsSnapshot],
+    workers: int | None = None,
+) -> list[tuple[SettingsSnapshot, dict[str, float]]]:
+    """Backtest every settings candidate over every series on a process pool.
+
+    The series are copied once into shared memory and attached by the workers
+    instead of being pickled with each task. Results are ranked by profit factor.
+    """
+    segments: list[shared_memory.SharedMemory] = []
+    try:
+        for prices in series:
+            prices = np.ascontiguousarray(prices, dtype=np.float64)
+            segment = shared_memory.SharedMemory(create=True, size=max(prices.nbytes, 1))
+            np.ndarray(prices.shape, dtype=np.float64, buffer=segment.buf)[:] = prices
+            segments.append(segment)
+
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_attach,
+            initargs=([(s.name, len(p)) for s, p in zip(segments, series)],),
+        ) as pool:
+            results = list(pool.map(_evaluate, settings, chunksize=4))
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+
+    return sorted(
+        results,
+        key=lambda result: (result[1]["profit_factor"], result[1]["profit"]),
+        reverse=True,
+    )
+
+
+def _int_list(value: str) -> list[int]:
+    if "-" in value:
+        start, end = value.split("-")
+        return list(range(int(start), int(end) + 1))
+    return [int(number) for number in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank Settings over price history.")
+    parser.add_argument("paths", nargs="+", help="CSV or Parquet price files")
+    parser.add_argument("--column", default="Close")
+    parser.add_argument("--allocation-of-funds", type=_int_list, default=[50])
+    parser.add_argument("--groups", type=_int_list, default=_int_list("1-4"))
+    parser.add_argument("--prices-in-groups", type=_int_list, default=_int_list("2-8"))
+    parser.add_argument("--compliance", type=_int_list, default=_int_list("1-7"))
+    parser.add_argument("--samples", type=int, help="random sample of the grid")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    ranked = sweep(
+        [load_prices(path, args.column)[1] for path in args.paths],
+        candidates(
+            args.allocation_of_funds,
+            args.groups,
+            args.prices_in_groups,
+            args.compliance,
+            args.samples,
+            args.seed,
+        ),
+        args.workers,
+    )
+    for settings, summary in ranked[: args.top]:
+        print(
+            f"{summary['profit_factor']:.3f}  profit {summary['profit']:.2f}  "
+            f"trades {summary['trades']}  {settings}"
+        )
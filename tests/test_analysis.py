@@ -0,0 +1,119 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from benchmarks.reference import marker_analyze
+from trading import AnalysisResult, RollingAnalyzer, analyze
+
+
+def random_groups(
+    rng: random.Random, ragged: bool = False, nan: bool = False
+) -> list[list[float]]:
+    width = rng.randint(1, 6)
+    groups = []
+    for _ in range(rng.randint(0, 4)):
+        # Few distinct prices, so ties are common
+        group = [float(rng.randint(1, 3)) for _ in range(width)]
+        if ragged:
+            group = group[: rng.randint(0, width)]
+        if nan and group and rng.random() < 0.3:
+            group[rng.randrange(len(group))] = math.nan
+        groups.append(group)
+    return groups
+
+
+@pytest.mark.parametrize(
+    "groups, compliance, expected",
+    [
+        ([[1, 2, 3], [3, 4, 5]], 2, AnalysisResult.GOING_UP),
+        ([[3, 2, 1], [5, 4, 3]], 2, AnalysisResult.GOING_DOWN),
+        ([[1, 2, 3], [3, 2, 1]], 2, AnalysisResult.INSUFFICIENT),
+        ([[1, 1, 1], [2, 2, 2]], 1, AnalysisResult.INSUFFICIENT),
+        # Every group counts as up once nothing is required
+        ([[3, 2, 1]], 0, AnalysisResult.GOING_UP),
+        # Single prices have no steps
+        ([[1], [2]], 1, AnalysisResult.INSUFFICIENT),
+        # No groups at all agree on anything
+        ([], 1, AnalysisResult.GOING_UP),
+        ([[1, 2], []], 1, AnalysisResult.INSUFFICIENT),
+        ([[1, 2], []], 0, AnalysisResult.GOING_UP),
+    ],
+)
+def test_known_results(groups, compliance, expected):
+    assert marker_analyze(groups, compliance) == expected
+    assert analyze(groups, compliance) == expected
+
+
+@pytest.mark.parametrize("ragged", [False, True])
+@pytest.mark.parametrize("nan", [False, True])
+def test_analyze_matches_marker_lists(ragged, nan):
+    rng = random.Random(f"{ragged}-{nan}")
+    for _ in range(5000):
+        groups = random_groups(rng, ragged, nan)
+        compliance = rng.randint(0, 6)
+        assert analyze(groups, compliance) == marker_analyze(groups, compliance), (
+            groups,
+            compliance,
+        )
+
+
+def test_analyze_accepts_arrays():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        groups = rng.integers(1, 4, (rng.integers(1, 5), rng.integers(1, 7)))
+        compliance = int(rng.integers(0, 6))
+        assert analyze(groups.astype(float), compliance) == marker_analyze(
+            groups.tolist(), compliance
+        )
+
+
+def split(prices: list[float], prices_in_groups: int) -> list[list[float]]:
+    return [
+        prices[start : start + prices_in_groups]
+        for start in range(0, len(prices), prices_in_groups)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_tumbling_matches_analyze(seed):
+    rng = random.Random(f"tumbling-{seed}")
+    for _ in range(500):
+        groups, prices_in_groups = rng.randint(1, 4), rng.randint(1, 5)
+        compliance = rng.randint(0, 5)
+        size = groups * prices_in_groups
+        prices = [float(rng.randint(1, 3)) for _ in range(rng.randint(0, 60))]
+
+        analyzer = RollingAnalyzer(groups, prices_in_groups, compliance)
+        # Each window is followed by the price that triggers its result
+        start = 0
+        for index, price in enumerate(prices):
+            result = analyzer.push(price)
+            if index < start + size:
+                assert result is None, (prices, index)
+                continue
+            window = split(prices[start : start + size], prices_in_groups)
+            assert result == analyze(window, compliance), (prices, index)
+            assert result == marker_analyze(window, compliance), (prices, index)
+            start = index + 1
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_sliding_matches_analyze(seed):
+    rng = random.Random(f"sliding-{seed}")
+    for _ in range(500):
+        groups, prices_in_groups = rng.randint(1, 4), rng.randint(1, 5)
+        compliance = rng.randint(0, 5)
+        size = groups * prices_in_groups
+        prices = [float(rng.randint(1, 3)) for _ in range(rng.randint(0, 60))]
+
+        analyzer = RollingAnalyzer(groups, prices_in_groups, compliance, sliding=True)
+        for index, price in enumerate(prices):
+            result = analyzer.push(price)
+            if index < size - 1:
+                assert result is None, (prices, index)
+                continue
+            window = split(prices[index - size + 1 : index + 1], prices_in_groups)
+            assert result == analyze(window, compliance), (prices, index)
+            assert result == marker_analyze(window, compliance), (prices, index)
@@ -0,0 +1,121 @@
+import os
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Epoch seconds, price, state code (see protocol.STATES)
+TICK = np.dtype([("t", "<f8"), ("p", "<f8"), ("s", "u1")])
+
+DAY = 86400
+
+
+def _day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+
+class TickStore:
+    """Append-only store of every price the trade nodes see.
+
+    Each ticker gets a directory with one file of packed `TICK` records per
+    UTC day. Writers buffer ticks and append them in batches; every ticker
+    must have a single writing process, which holds since trade nodes are
+    sharded by ticker. Readers memory-map the day files and binary search the
+    timestamps, so a range scan only touches the pages it returns.
+    """
+
+    def __init__(
+        self, root: str | Path, batch_size: int = 1024, flush_interval: float = 1.0
+    ) -> None:
+        self.root = Path(root)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffers: dict[str, list[tuple[float, float, int]]] = {}
+        self._flushed: dict[str, float] = {}
+
+    def append(self, ticker: str, timestamp: float, price: float, state: int) -> None:
+        buffer = self._buffers.get(ticker)
+        if buffer is None:
+            buffer = self._buffers[ticker] = []
+            self._flushed.setdefault(ticker, time.monotonic())
+        buffer.append((timestamp, price, state))
+
+        if (
+            len(buffer) >= self.batch_size
+            or time.monotonic() - self._flushed[ticker] >= self.flush_interval
+        ):
+            self._write(ticker)
+
+    def flush(self, ticker: str | None = None) -> None:
+        for pending in [ticker] if ticker is not None else list(self._buffers):
+            self._write(pending)
+
+    def _write(self, ticker: str) -> None:
+        self._flushed[ticker] = time.monotonic()
+        buffer = self._buffers.pop(ticker, None)
+        if not buffer:
+            return
+
+        ticks = np.array(buffer, dtype=TICK)
+        # Split the batch where it crosses midnight
+        days = ticks["t"] // DAY
+        for chunk in np.split(ticks, np.flatnonzero(np.diff(days)) + 1):
+            path = self.root / ticker / f"{_day(chunk['t'][0])}.ticks"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "ab") as file:
+                chunk.tofile(file)
+
+    @staticmethod
+    def _map(path: Path) -> np.ndarray:
+        # A concurrent append may have left a partial record at the end
+        count = path.stat().st_size // TICK.itemsize
+        if count == 0:
+            return np.empty(0, TICK)
+        return np.memmap(path, TICK, mode="r", shape=(count,))
+
+    def first(self, ticker: str) -> float | None:
+        """Timestamp of the oldest stored tick of `ticker`."""
+        directory = self.root / ticker
+        if not directory.is_dir():
+            return None
+        for path in sorted(directory.glob("*.ticks")):
+            ticks = self._map(path)
+            if len(ticks):
+                return float(ticks["t"][0])
+        return None
+
+    def segments(
+        self, ticker: str, start: float | None = None, end: float | None = None
+    ) -> list[np.ndarray]:
+        """Ticks with `start` <= t <= `end`, both optional, as one memory-mapped
+        array per day file, oldest first. Nothing is read until used."""
+        directory = self.root / ticker
+        if not directory.is_dir():
+            return []
+
+        first = _day(start) if start is not None else ""
+        last = _day(end) if end is not None else "~"
+        segments = []
+        for path in sorted(directory.glob("*.ticks")):
+            if not first <= path.stem <= last:
+                continue
+            ticks = self._map(path)
+            # bisect probes a few records, np.searchsorted would copy the
+            # strided column first
+            times = ticks["t"]
+            low = 0 if start is None else bisect_left(times, start)
+            high = len(ticks) if end is None else bisect_right(times, end)
+            if low < high:
+                segments.append(ticks[low:high])
+        return segments
+
+    def range(
+        self, ticker: str, start: float | None = None, end: float | None = None
+    ) -> np.ndarray:
+        """Ticks with `start` <= t <= `end`, both optional, oldest first."""
+        segments = self.segments(ticker, start, end)
+        return np.concatenate(segments) if segments else np.empty(0, TICK)
+
+tick_store = TickStore(os.environ.get("JELLYFISH_TICKS", "ticks"))
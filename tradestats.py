@@ -0,0 +1,256 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from backtest import profit_factor
+from db import orm
+from models import Trade
+from trading import Broker, TradeState
+
+# Statistics of all tickers together are published under this ticker
+GLOBAL = "global"
+
+# Window id -> name shown in the statistics view
+WINDOWS = {
+    "now": "Aktuální",
+    "daily": "Denní",
+    "weekly": "Týdenní",
+    "monthly": "Měsíční",
+    "yearly": "Roční",
+}
+
+@dataclass
+class Totals:
+    number_of_trades: int = 0
+    expenditure: float = 0.0
+    revenue: float = 0.0
+    fee: float = 0.0
+    gross_profit: float = 0.0
+    gross_loss: float = 0.0
+
+    def add(self, other: "Totals", sign: int = 1) -> None:
+        self.number_of_trades += sign * other.number_of_trades
+        self.expenditure += sign * other.expenditure
+        self.revenue += sign * other.revenue
+        self.fee += sign * other.fee
+        self.gross_profit += sign * other.gross_profit
+        self.gross_loss += sign * other.gross_loss
+
+    @property
+    def profit(self) -> float:
+        return self.gross_profit - self.gross_loss
+
+    def display(self, currency: str) -> dict[str, int | str]:
+        factor = profit_factor(self.gross_profit, self.gross_loss)
+        return {
+            "number_of_trades": self.number_of_trades,
+            "expenditure": f"{self.expenditure:.2f} {currency}",
+            "revenue": f"{self.revenue:.2f} {currency}",
+            "fee": f"{self.fee:.2f} {currency}",
+            "profit": f"{self.profit:.2f} {currency}",
+            "profit_factor": "∞" if factor == float("inf") else f"{factor:.2f}",
+        }
+
+
+def trade_totals(
+    side: str | None,
+    amount: float,
+    opening_price: float,
+    closing_price: float | None,
+    fee_rate: float,
+) -> Totals:
+    """What one trade adds to the statistics. A long buys at the opening price
+    and sells at the closing price, a short the other way around. Profit only
+    counts once the trade is closed."""
+    opening = opening_price * amount
+    closing = 0.0 if closing_price is None else closing_price * amount
+    if side == TradeState.SHORTING.value:
+        expenditure, revenue = closing, opening
+    else:
+        expenditure, revenue = opening, closing
+    fee = fee_rate * (opening + closing)
+
+    totals = Totals(1, expenditure, revenue, fee)
+    if closing_price is not None:
+        profit = revenue - expenditure - fee
+        totals.gross_profit = max(profit, 0.0)
+        totals.gross_loss = max(-profit, 0.0)
+    return totals
+
+
+def window_start(window: str, today: date) -> date:
+    if window == "daily":
+        return today
+    if window == "weekly":
+        return today - timedelta(days=6)
+    if window == "monthly":
+        return today.replace(day=1)
+    return today.replace(month=1, day=1)
+
+
+class TradeStatistics:
+    """Trade statistics per ticker and window, updated as trades open and close.
+
+    Closed trades are summed into one bucket per ticker and closing day, and
+    the totals of the daily to yearly windows are kept next to them, so a
+    trade updates a fixed number of totals. The windows are recomputed from
+    the day buckets only when the date changes. The "now" window covers the
+    positions that are still open. Everything is also summed under `GLOBAL`.
+    The `Trade` table is only read by `load`, grouped by day.
+    """
+
+    def __init__(self, fee_rate: float = Broker.fee_rate) -> None:
+        self.fee_rate = fee_rate
+        self.days: dict[str, dict[date, Totals]] = {}
+        self.windows: dict[str, dict[str, Totals]] = {}
+        self.today: date | None = None
+        # First day of every window but "now" as of `today`
+        self.starts: dict[str, date] = {}
+        # Open trades by (ticker, opened), a ticker has one open at a time
+        self.open: dict[tuple[str, datetime], Totals] = {}
+        self.now: dict[str, Totals] = {}
+
+    @staticmethod
+    def _oldest(today: date) -> date:
+        return min(window_start(window, today) for window in WINDOWS)
+
+    def load(self, session_factory: Callable[[], Session] = orm.Session) -> None:
+        """Rebuild everything from the `Trade` table with grouped queries."""
+        self.days.clear()
+        self.windows.clear()
+        self.today = None
+        self.starts = {}
+        self.open.clear()
+        self.now.clear()
+        since = datetime.combine(self._oldest(date.today()), datetime.min.time())
+
+        shorting = func.coalesce(Trade.side, TradeState.BOUGHT.value) == (
+            TradeState.SHORTING.value
+        )
+        opening = Trade.opening_price * Trade.amount
+        closing = Trade.closing_price * Trade.amount
+        direction = case((shorting, -1), else_=1)
+        fee = self.fee_rate * (opening + closing)
+        profit = direction * (closing - opening) - fee
+        day = func.date(Trade.closed)
+
+        query = (
+            select(
+                Trade.trade_server_id,
+                day,
+                func.count(),
+                func.sum(case((shorting, closing), else_=opening)),
+                func.sum(case((shorting, opening), else_=closing)),
+                func.sum(fee),
+                # SQLite's max() with two arguments is a scalar
+                func.sum(func.max(profit, 0.0)),
+                func.sum(func.max(-profit, 0.0)),
+            )
+            .where(Trade.closed >= since)
+            .group_by(Trade.trade_server_id, day)
+        )
+        open_query = select(
+            Trade.trade_server_id,
+            Trade.opened,
+            Trade.side,
+            Trade.amount,
+            Trade.opening_price,
+        ).where(Trade.closed.is_(None))
+
+        with session_factory() as db_session:
+            for ticker, closed_day, *sums in db_session.execute(query):
+                self._add_closed(ticker, date.fromisoformat(closed_day), Totals(*sums))
+            for ticker, opened, side, amount, opening_price in db_session.execute(
+                open_query
+            ):
+                totals = trade_totals(side, amount, opening_price, None, self.fee_rate)
+                self._add_open(ticker, opened, totals)
+        self._roll_over(date.today())
+
+    def _add_closed(self, ticker: str, day: date, totals: Totals) -> None:
+        for key in (ticker, GLOBAL):
+            buckets = self.days.setdefault(key, {})
+            bucket = buckets.get(day)
+            if bucket is None:
+                bucket = buckets[day] = Totals()
+            bucket.add(totals)
+
+            windows = self.windows.setdefault(key, {})
+            for window, start in self.starts.items():
+                if day >= start:
+                    windows.setdefault(window, Totals()).add(totals)
+
+    def _add_open(self, ticker: str, opened: datetime, totals: Totals) -> None:
+        self.open[(ticker, opened)] = totals
+        for key in (ticker, GLOBAL):
+            self.now.setdefault(key, Totals()).add(totals)
+
+    def _remove_open(self, ticker: str, opened: datetime) -> None:
+        totals = self.open.pop((ticker, opened), None)
+        if totals is None:
+            return
+        for key in (ticker, GLOBAL):
+            self.now[key].add(totals, -1)
+
+    def _roll_over(self, today: date) -> None:
+        """Drop day buckets no window needs and recompute the windows."""
+        self.today = today
+        self.starts = {
+            window: window_start(window, today) for window in WINDOWS if window != "now"
+        }
+        oldest = min(self.starts.values())
+        self.windows.clear()
+        for key, buckets in self.days.items():
+            for day in [day for day in buckets if day < oldest]:
+                del buckets[day]
+
+            windows = self.windows[key] = {}
+            for window, start in self.starts.items():
+                totals = windows[window] = Totals()
+                for day, bucket in buckets.items():
+                    if day >= start:
+                        totals.add(bucket)
+
+    def apply(self, trade: dict) -> None:
+        """Account for a trade message from a trade node, see `TradeNode.trade`."""
+        ticker = trade["ticker"]
+        side = TradeState(trade["side"]).value
+        amount, opening_price = trade["amount"], trade["opening_price"]
+
+        if trade["closed"] is None:
+            totals = trade_totals(side, amount, opening_price, None, self.fee_rate)
+            self._add_open(ticker, trade["opened"], totals)
+            return
+
+        self._remove_open(ticker, trade["opened"])
+        totals = trade_totals(
+            side, amount, opening_price, trade["closing_price"], self.fee_rate
+        )
+        today = date.today()
+        if self.today != today:
+            self._roll_over(today)
+        self._add_closed(ticker, trade["closed"].date(), totals)
+
+    def window(self, ticker: str, window: str, today: date | None = None) -> Totals:
+        if window == "now":
+            return self.now.get(ticker) or Totals()
+
+        today = today or date.today()
+        if self.today != today:
+            self._roll_over(today)
+        return self.windows.get(ticker, {}).get(window) or Totals()
+
+    def view(self, ticker: str, currency: str) -> list[dict[str, int | str]]:
+        """Rows of the statistics template, amounts labelled with `currency`."""
+        today = date.today()
+        return [
+            {
+                "name": name,
+                "id": window,
+                **self.window(ticker, window, today).display(currency),
+            }
+            for window, name in WINDOWS.items()
+        ]
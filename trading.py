@@ -1,9 +1,14 @@
 from dataclasses import dataclass
+from datetime import datetime
 from enum import Enum
+from typing import Callable, Sequence
 
+import numpy as np
 import yfinance
 from result import Result, Ok
 
+from bars import Bar, BarBuilder
+
 
 class TradeState(str, Enum):
     DEFAULT = "analyzing"
@@ -17,10 +22,164 @@ class AnalysisResult(Enum):
     GOING_DOWN = 3
 
 
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    allocation_of_funds: int
+    groups: int
+    prices_in_groups: int
+    compliance: int
+
+
+def analyze(
+    groups: Sequence[Sequence[float]] | np.ndarray, compliance: int
+) -> AnalysisResult:
+    """Analyze a (groups, prices_in_groups) array or list of groups at once.
+
+    A group trends up when at least `compliance` of its price steps go up,
+    otherwise down when at least `compliance` go down. The result is GOING_UP
+    or GOING_DOWN only when all groups agree.
+    """
+    if len(groups) == 0:
+        groups = np.empty((0, 0))
+    try:
+        groups = np.asarray(groups, dtype=np.float64)
+    except ValueError:
+        # Ragged groups: NaN padding never counts as a move up or down
+        width = max(len(group) for group in groups)
+        groups = np.array(
+            [list(group) + [np.nan] * (width - len(group)) for group in groups]
+        )
+
+    steps = np.diff(groups, axis=-1)
+    up = np.count_nonzero(steps > 0, axis=-1) >= compliance
+    down = ~up & (np.count_nonzero(steps < 0, axis=-1) >= compliance)
+    if up.all():
+        return AnalysisResult.GOING_UP
+    if down.all():
+        return AnalysisResult.GOING_DOWN
+    return AnalysisResult.INSUFFICIENT
+
+
+class RollingAnalyzer:
+    """Incremental version of `analyze` fed one price at a time.
+
+    Up and down step counts are kept per group as prices arrive, so deciding
+    never re-scans the prices. By default groups are filled back to back and a
+    result is returned once all of them are full, after which the analyzer
+    starts over (the price completing the last group is only used to trigger
+    the decision, as in `TradeNode.trade`). With `sliding` the groups cover the
+    latest `groups * prices_in_groups` prices and every price past the warm-up
+    returns a result. Memory is fixed at `groups * prices_in_groups` steps.
+    """
+
+    def __init__(
+        self, groups: int, prices_in_groups: int, compliance: int, sliding: bool = False
+    ) -> None:
+        if groups < 1 or prices_in_groups < 1:
+            raise ValueError("groups and prices_in_groups must be at least 1")
+
+        self.groups = groups
+        self.prices_in_groups = prices_in_groups
+        self.compliance = compliance
+        self.sliding = sliding
+        self.reset()
+
+    def configure(self, groups: int, prices_in_groups: int, compliance: int) -> None:
+        self.compliance = compliance
+        if (groups, prices_in_groups) != (self.groups, self.prices_in_groups):
+            self.__init__(groups, prices_in_groups, compliance, self.sliding)
+
+    def reset(self) -> None:
+        self._up = [0] * self.groups
+        self._down = [0] * self.groups
+        self._last: float | None = None
+        # Tumbling mode: position inside the group being filled
+        self._completed = 0
+        self._length = 0
+        # Sliding mode: ring buffer of the last steps (1 up, -1 down, 0 flat)
+        self._steps = [0] * (self.groups * self.prices_in_groups)
+        self._seen = 0
+
+    def push(self, price: float) -> AnalysisResult | None:
+        if self.sliding:
+            return self._push_sliding(price)
+        return self._push_tumbling(price)
+
+    def _result(self) -> AnalysisResult:
+        up_groups = down_groups = 0
+        for up, down in zip(self._up, self._down):
+            if up >= self.compliance:
+                up_groups += 1
+            elif down >= self.compliance:
+                down_groups += 1
+
+        if up_groups == self.groups:
+            return AnalysisResult.GOING_UP
+        if down_groups == self.groups:
+            return AnalysisResult.GOING_DOWN
+        return AnalysisResult.INSUFFICIENT
+
+    def _push_tumbling(self, price: float) -> AnalysisResult | None:
+        if self._length == self.prices_in_groups:
+            self._completed += 1
+            self._length = 0
+            self._last = None
+            if self._completed == self.groups:
+                result = self._result()
+                self.reset()
+                return result
+
+        if self._last is not None:
+            if price > self._last:
+                self._up[self._completed] += 1
+            elif price < self._last:
+                self._down[self._completed] += 1
+        self._last = price
+        self._length += 1
+        return None
+
+    def _push_sliding(self, price: float) -> AnalysisResult | None:
+        last, self._last = self._last, price
+        steps, size = self._steps, len(self._steps)
+        index = self._seen
+        self._seen += 1
+        if last is not None:
+            steps[index % size] = (price > last) - (price < last)
+
+        if self._seen < size:
+            return None
+
+        if self._seen == size:
+            # Window filled for the first time, count every group once
+            for group in range(self.groups):
+                start = group * self.prices_in_groups
+                group_steps = steps[start + 1 : start + self.prices_in_groups]
+                self._up[group] = group_steps.count(1)
+                self._down[group] = group_steps.count(-1)
+            return self._result()
+
+        # Every group moves one price forward: it loses its oldest step and
+        # gains the step that used to open the next group
+        start = index - size + 1
+        for group in range(self.groups):
+            offset = start + group * self.prices_in_groups
+            self._count(steps[offset % size], -1, group)
+            self._count(steps[(offset + self.prices_in_groups - 1) % size], 1, group)
+        return self._result()
+
+    def _count(self, step: int, delta: int, group: int) -> None:
+        if step == 1:
+            self._up[group] += delta
+        elif step == -1:
+            self._down[group] += delta
+
+
 # Broker API
 class Broker:
     name: str = "Broker"
     working_hours: str = "8:00 - 18:00"
+    # Charged on the value of every order
+    fee_rate: float = 0.0
 
     @staticmethod
     def is_available(_ticker: str) -> Result[bool, str]:
@@ -43,13 +202,16 @@ class Brokerage:
     bought_stocks: int = 0
     mode: TradeState = TradeState.DEFAULT
 
-    def buy(self, price: float, amount: int) -> None:
+    def buy(self, price: float, amount: int) -> bool:
         total_price = amount * price
-        if total_price < self.budget:
-            self.bought_price = price
-            self.budget -= total_price
-            self.bought_stocks = amount
-            self.mode = TradeState.BOUGHT
+        if total_price >= self.budget:
+            return False
+
+        self.bought_price = price
+        self.budget -= total_price
+        self.bought_stocks = amount
+        self.mode = TradeState.BOUGHT
+        return True
 
     def sell(self, price: float) -> None:
         total_price = self.bought_stocks * price
@@ -58,9 +220,12 @@ class Brokerage:
         self.bought_price = None
         self.mode = TradeState.DEFAULT
 
-    def short(self, price: float, amount: int) -> None:
-        self.buy(price, amount)
+    def short(self, price: float, amount: int) -> bool:
+        if not self.buy(price, amount):
+            return False
+
         self.mode = TradeState.SHORTING
+        return True
 
     def end_short(self, price: float) -> None:
         start_price = self.bought_stocks * self.bought_price
@@ -80,3 +245,151 @@ class Brokerage:
             self.sell(price)
         elif self.mode == TradeState.SHORTING:
             self.end_short(price)
+
+
+@dataclass
+class Position:
+    side: TradeState
+    amount: float
+    opening_price: float
+    opened: datetime
+    closing_price: float | None = None
+    closed: datetime | None = None
+
+    @property
+    def profit(self) -> float:
+        if self.closing_price is None:
+            return 0.0
+        if self.side == TradeState.SHORTING:
+            return (self.opening_price - self.closing_price) * self.amount
+        return (self.closing_price - self.opening_price) * self.amount
+
+
+@dataclass
+class Decision:
+    state: TradeState
+    opened: Position | None = None
+    closed: Position | None = None
+
+
+class Strategy:
+    """Decision rules of a trade node, free of I/O.
+
+    Feed it prices with `on_price` and persist or publish the returned
+    `Decision`. Timestamps come from `clock`, so replays can supply their own.
+    `candles` reads the bars of `ticker` from `bars`, which the caller keeps
+    up to date with the same prices.
+    """
+
+    def __init__(
+        self,
+        settings: SettingsSnapshot,
+        budget: float = 1000,
+        clock: Callable[[], datetime] = datetime.now,
+        sliding: bool = False,
+        ticker: str = "",
+        bars: BarBuilder | None = None,
+    ) -> None:
+        self.settings = settings
+        self.ticker = ticker
+        self.bars = bars
+        self.budget = budget
+        self.clock = clock
+        self.brokerage = Brokerage(budget)
+        self.analyzer = RollingAnalyzer(
+            settings.groups, settings.prices_in_groups, settings.compliance, sliding
+        )
+        self.state = TradeState.DEFAULT
+        self.position: Position | None = None
+        self.last_price: float | None = None
+
+    def candles(self, resolution: str, count: int | None = None) -> list[Bar]:
+        """Closed bars of `ticker`, oldest first, see `BarBuilder.bars`."""
+        if self.bars is None:
+            return []
+        return self.bars.bars(self.ticker, resolution, count)
+
+    def update_settings(self, settings: SettingsSnapshot) -> None:
+        self.settings = settings
+        self.analyzer.configure(
+            settings.groups, settings.prices_in_groups, settings.compliance
+        )
+
+    def _open(self, side: TradeState, price: float, amount: float) -> Position | None:
+        if side == TradeState.BOUGHT:
+            filled = self.brokerage.buy(price, amount)
+        else:
+            filled = self.brokerage.short(price, amount)
+        if not filled:
+            return None
+
+        self.position = Position(side, amount, price, self.clock())
+        self.state = side
+        return self.position
+
+    def _close(self, price: float) -> Position:
+        if self.state == TradeState.BOUGHT:
+            self.brokerage.sell(price)
+        else:
+            self.brokerage.end_short(price)
+        position, self.position = self.position, None
+        position.closing_price = price
+        position.closed = self.clock()
+        self.state = TradeState.DEFAULT
+        return position
+
+    def resume(self, position: Position) -> bool:
+        """Continue with a position opened before a restart, False if the
+        brokerage cannot cover it."""
+        if position.side == TradeState.BOUGHT:
+            filled = self.brokerage.buy(position.opening_price, position.amount)
+        else:
+            filled = self.brokerage.short(position.opening_price, position.amount)
+        if not filled:
+            return False
+
+        self.position = position
+        self.state = position.side
+        return True
+
+    def on_price(self, price: float) -> Decision | None:
+        last_price, self.last_price = self.last_price, price
+        if last_price is None:
+            return None
+
+        closed = None
+        # Stop loss against the opening price, then against the previous price
+        if self.state == TradeState.BOUGHT:
+            if price < self.position.opening_price or last_price > price:
+                closed = self._close(price)
+        elif self.state == TradeState.SHORTING:
+            if price > self.position.opening_price or last_price < price:
+                closed = self._close(price)
+
+        analysis_result = self.analyzer.push(price)
+        if analysis_result is None:
+            return Decision(self.state, closed=closed)
+
+        amount = self.budget * (self.settings.allocation_of_funds / 100) / 10 / price
+
+        if self.state == TradeState.BOUGHT:
+            if analysis_result == AnalysisResult.GOING_DOWN:
+                closed = self._close(price)
+            return Decision(TradeState.BOUGHT, closed=closed)
+
+        elif self.state == TradeState.SHORTING:
+            if analysis_result == AnalysisResult.GOING_UP:
+                closed = self._close(price)
+            return Decision(TradeState.SHORTING, closed=closed)
+
+        opened = None
+        if analysis_result == AnalysisResult.GOING_UP:
+            opened = self._open(TradeState.BOUGHT, price, amount)
+        elif analysis_result == AnalysisResult.GOING_DOWN:
+            opened = self._open(TradeState.SHORTING, price, amount)
+        return Decision(self.state, opened=opened, closed=closed)
+
+    def end_trading(self, price: float | None) -> Position | None:
+        if self.position is None:
+            return None
+        return self._close(price)